@@ -0,0 +1,64 @@
+"""
+公式引擎与模板自定义函数的计算结果应与 Excel 一致。
+
+fixtures/公式与自定义函数.xlsx 的“计算”表中每个单元格对应一个用例，期望值为
+Excel（模板中的VBA函数）对同一公式给出的结果；Z 列全部为空单元格。
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, '工具'))
+
+from formula_engine import FormulaEngine, output_value  # noqa: E402
+
+FIXTURE = os.path.join(ROOT, 'tests', 'fixtures', '公式与自定义函数.xlsx')
+
+
+def _load_script():
+    path = os.path.join(ROOT, '自用--每月固定', '2-绩效计算生成.py')
+    spec = importlib.util.spec_from_file_location('performance_script', path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope='module')
+def results():
+    script = _load_script()
+    functions = {
+        '计算得分': script.calculate_score,
+        '病区折扣比例': script.ward_discount_ratio,
+        '门诊折扣比例': script.outpatient_discount_ratio,
+    }
+    engine = FormulaEngine(os.path.dirname(FIXTURE), log=lambda message: None)
+    name = engine.load_template(FIXTURE, functions=functions)
+    engine.calculate()
+    return {position: output_value(value) for position, value in engine.values(name)['计算'].items()}
+
+
+@pytest.mark.parametrize('position, expected', [
+    # VLOOKUP / SUMIF
+    ((1, 1), 20),        # 整列精确查找
+    ((2, 1), 15),        # 按条件求和
+    ((3, 1), '#N/A'),    # 找不到
+    ((4, 1), 0),         # IFERROR 包住的查找失败
+    # 计算得分
+    ((1, 2), 10),        # 未超过目标值，得满分（不超过上限）
+    ((2, 2), 5),         # 超出10，每单位扣0.5
+    ((3, 2), 0),         # 扣分/上限/下限/方法为空单元格时按0计算
+    ((4, 2), '--'),      # 实际值为空
+    ((5, 2), '--'),      # 实际值为空文字
+    ((6, 2), 10),        # 扣分为空文字按0计算
+    # 病区/门诊折扣比例
+    ((1, 3), 0.75),
+    ((2, 3), 0.5),       # 空单元格按0
+    ((3, 3), 0.1),
+    ((4, 3), 0.1),       # 空单元格按0
+])
+def test_matches_excel(results, position, expected):
+    assert results[position] == expected
@@ -1,11 +1,132 @@
+import io
+import multiprocessing
 import os
+import sys
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from tkinter import filedialog
 import tkinter as tk
-import zipfile
 from datetime import datetime
 
-def process_excel_files():
+# 共享模块位于仓库的“工具”目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '工具'))
+from table_cache import read_excel_cached
+from workload_store import SOURCE_DOCTOR, WorkloadStore
+from xlsx_writer import write_table
+from zip_packager import STORED, ZipPackager
+
+# 第4行中要提取的指标；数值位于指标名所在列右侧第2列
+METRICS = ['出院人次', '门诊人次', '1级手术', '2级手术', '3级手术', '4级手术',
+           '3级微创手术', '4级微创手术', '医生中医适宜技术']
+# 转换为数值的指标，无法识别的值按0计
+NUMERIC_METRICS = ['1级手术', '2级手术', '3级手术', '4级手术', '3级微创手术', '4级微创手术', '医生中医适宜技术']
+# 输出到科室文件的列顺序
+OUTPUT_COLUMNS = ['日期', '出院人次', '门诊人次', '1级手术', '2级手术', '3级手术', '4级手术',
+                  '医生中医适宜技术', '微创手术']
+
+
+# 少于该数量的文件不值得启动进程池
+PARALLEL_THRESHOLD = 4
+
+# 表头指纹 -> 各指标数值所在的列；每个进程各自缓存
+_layouts = {}
+
+
+def header_layout(df):
+    """
+    返回 METRICS 各指标数值所在的列号。
+
+    第4、5行内容相同的文件版式相同，按这两行的指纹缓存，不再逐个查找指标名。
+    """
+    fingerprint = tuple('' if pd.isna(value) else str(value) for value in df.iloc[:2].to_numpy().ravel())
+    value_columns = _layouts.get(fingerprint)
+    if value_columns is None:
+        header_row_1 = df.iloc[0].tolist()
+        value_columns = _layouts[fingerprint] = [header_row_1.index(metric) + 2 for metric in METRICS]
+    return value_columns
+
+
+def extract_workload(df, date_info):
+    """
+    从一个月的工作量表中整理出各科室的数据，整表按列计算。
+
+    :param df: read_excel(header=None, skiprows=3) 的结果，第0行为指标名
+    :return: 第一列为“科室”，其余为 OUTPUT_COLUMNS 的 DataFrame
+    """
+    value_columns = header_layout(df)
+
+    # 从第6行开始是科室数据，跳过科室名称为空的行
+    body = df.iloc[2:]
+    body = body[body[0].notna()]
+
+    values = body.iloc[:, value_columns]
+    values.columns = METRICS
+    values = values.copy()
+    values[NUMERIC_METRICS] = values[NUMERIC_METRICS].apply(pd.to_numeric, errors='coerce').fillna(0)
+    values['微创手术'] = values['3级微创手术'] + values['4级微创手术']
+    values['日期'] = date_info
+
+    result = values[OUTPUT_COLUMNS]
+    result.insert(0, '科室', body[0])
+    return result.reset_index(drop=True)
+
+
+def load_month(file_path):
+    """读取并整理一个月的工作量文件，返回 (日期, 整理后的 DataFrame)；可在工作进程中执行"""
+    file_name = os.path.basename(file_path)
+    date_info = file_name.split('工作量.xlsx')[0]  # 提取日期信息
+
+    # 读取Excel文件，不直接指定列，因为需要动态查找
+    df = read_excel_cached(file_path, header=None, skiprows=3)
+    return date_info, extract_workload(df, date_info)
+
+
+def load_months(files, workers=None):
+    """
+    读取多个月份的工作量文件，文件较多时在进程池中并行解析。
+
+    :return: [(日期, DataFrame), ...]，按日期排序
+    """
+    files = list(files)
+    if workers == 1 or len(files) < PARALLEL_THRESHOLD:
+        results = [load_month(file_path) for file_path in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            results = list(executor.map(load_month, files))
+    return sorted(results, key=lambda result: result[0])
+
+
+def workload_facts(frame):
+    """把 extract_workload 的结果展开为 (科室, 指标, 数值)"""
+    for row in frame.itertuples(index=False):
+        department_name = row[0]
+        for column, value in zip(OUTPUT_COLUMNS[1:], row[2:]):
+            yield department_name, column, value
+
+
+def import_existing_files(store, output_folder):
+    """把以前生成的科室文件（工作量明细）导入数据库"""
+    for file_name in os.listdir(output_folder):
+        if not file_name.endswith('.xlsx') or file_name.startswith('~$'):
+            continue
+        department_name = file_name[:-len('.xlsx')]
+        try:
+            existing_df = pd.read_excel(os.path.join(output_folder, file_name), sheet_name='工作量明细')
+        except Exception as e:
+            print(f"导入历史文件 {file_name} 失败: {str(e)}")
+            continue
+        for row in existing_df.to_dict(orient='records'):
+            period = row.pop('日期', None)
+            if pd.notna(period):
+                store.upsert(SOURCE_DOCTOR, str(period),
+                             ((department_name, column, value) for column, value in row.items()))
+
+
+def process_excel_files(include_existing=False):
+    """
+    :param include_existing: 为 True 时，输出文件夹中本次没有重新生成的旧文件也一并打包；
+        默认只打包本次生成的科室文件
+    """
     # 创建一个临时的root窗口（但不显示）
     root = tk.Tk()
     root.withdraw()
@@ -27,110 +148,56 @@ def process_excel_files():
     # 如果输出文件夹不存在，则创建
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
-    
-    # 遍历选择的文件
-    for file_path in files:
-        file_name = os.path.basename(file_path)
-        date_info = file_name.split('工作量.xlsx')[0]  # 提取日期信息
-        
-        # 读取Excel文件，不直接指定列，因为需要动态查找
-        df = pd.read_excel(file_path, header=None, skiprows=3)
-
-        # 提取第4行和第5行的内容
-        header_row_1 = df.iloc[0].tolist()  # 第4行
-        header_row_2 = df.iloc[1].tolist()  # 第5行
-        
-        # 找到需要的列索引
-        indices = {
-            '出院人次': header_row_1.index('出院人次'),
-            '门诊人次': header_row_1.index('门诊人次'),
-            '1级手术': header_row_1.index('1级手术'),
-            '2级手术': header_row_1.index('2级手术'),
-            '3级手术': header_row_1.index('3级手术'),
-            '4级手术': header_row_1.index('4级手术'),
-            '3级微创手术': header_row_1.index('3级微创手术'),
-            '4级微创手术': header_row_1.index('4级微创手术'),
-            '医生中医适宜技术': header_row_1.index('医生中医适宜技术')
-        }
-        
-        # 收集每个科室的数据
-        for index, row in df.iterrows():
-            if index >= 2:  # 从第6行开始读取
-                department_name = row[0]  # 科室名称
-                if pd.notna(department_name):  # 确保科室名称不是NaN
-                    data = {
-                        '日期': date_info,
-                        '出院人次': row[indices['出院人次']+2],
-                        '门诊人次': row[indices['门诊人次']+2],
-                        '1级手术': row[indices['1级手术']+2],
-                        '2级手术': row[indices['2级手术']+2],
-                        '3级手术': row[indices['3级手术']+2],
-                        '4级手术': row[indices['4级手术']+2],
-                        '3级微创手术': row[indices['3级微创手术']+2],
-                        '4级微创手术': row[indices['4级微创手术']+2],
-                        '医生中医适宜技术': row[indices['医生中医适宜技术']+2]
-                    }
-                    
-                    # 确保数值类型一致，转换为数值类型
-                    try:
-                        微创3级 = float(data['3级微创手术']) if pd.notna(data['3级微创手术']) else 0
-                        微创4级 = float(data['4级微创手术']) if pd.notna(data['4级微创手术']) else 0
-                        data['微创手术'] = 微创3级 + 微创4级
-                        data['医生中医适宜技术'] = float(data['医生中医适宜技术']) if pd.notna(data['医生中医适宜技术']) else 0
-                        # 转换手术数据为数值类型
-                        for level in ['1级手术', '2级手术', '3级手术', '4级手术']:
-                            data[level] = float(data[level]) if pd.notna(data[level]) else 0
-                    except (ValueError, TypeError):
-                        if '微创手术' not in data:
-                            data['微创手术'] = 0
-                        if '医生中医适宜技术' not in data:
-                            data['医生中医适宜技术'] = 0
-                        for level in ['1级手术', '2级手术', '3级手术', '4级手术']:
-                            if level not in data:
-                                data[level] = 0
-
-                    # 去除data['3级微创手术'] 和 data['4级微创手术']
-                    del data['3级微创手术']
-                    del data['4级微创手术']
-                    
-                    # 将数据转化为DataFrame
-                    department_df = pd.DataFrame([data])
-                    
-                    # 保存到新的Excel文件中
-                    output_file_path = os.path.join(output_folder, f'{department_name}.xlsx')
-                    if os.path.exists(output_file_path):
-                        # 读取现有的数据
-                        existing_df = pd.read_excel(output_file_path, sheet_name='工作量明细')
-                        # 追加新的数据
-                        final_df = pd.concat([existing_df, department_df], ignore_index=True)
-                    else:
-                        final_df = department_df
-                    
-                    # 保存到新的Excel文件中
-                    with pd.ExcelWriter(output_file_path, engine='openpyxl') as writer:
-                        final_df.to_excel(writer, sheet_name='工作量明细', index=False)
-                        # 设置列宽
-                        worksheet = writer.sheets['工作量明细']
-                        for column in worksheet.columns:
-                            worksheet.column_dimensions[column[0].column_letter].width = 10
+
+    # 本次生成的科室文件：文件名 -> 最新内容，打包时直接使用，不再从磁盘读回
+    generated_files = {}
+    with WorkloadStore() as store:
+        # 第一次使用数据库时，把文件夹中已有的科室文件作为历史导入
+        if not store.periods(SOURCE_DOCTOR):
+            import_existing_files(store, output_folder)
+
+        # 只把本次选择的月份写入数据库，同一月份重复导入会整月替换；
+        # 该月原有、这次已不存在的科室也要重新生成，去掉残留的数据
+        departments = {}
+        for date_info, frame in load_months(files):
+            departments.update(dict.fromkeys(store.period_values(SOURCE_DOCTOR, date_info)))
+            store.replace_period(SOURCE_DOCTOR, date_info, workload_facts(frame))
+            departments.update(dict.fromkeys(frame['科室']))
+
+        # 本次涉及的科室按数据库中的全部历史重新生成
+        for department_name in departments:
+            history = store.department_history(SOURCE_DOCTOR, department_name)
+            rows = [[period] + [values.get(column) for column in OUTPUT_COLUMNS[1:]]
+                    for period, values in history.items()]
+
+            output_file_path = os.path.join(output_folder, f'{department_name}.xlsx')
+            buffer = io.BytesIO()
+            write_table(buffer, '工作量明细', OUTPUT_COLUMNS, rows, width=10)
+            with open(output_file_path, 'wb') as f:
+                f.write(buffer.getvalue())
+            generated_files[f'{department_name}.xlsx'] = buffer.getvalue()
 
     # 创建ZIP文件
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     zip_filename = os.path.join(desktop_path, f'医生的工作量_{timestamp}.zip')
     
-    with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # 遍历输出文件夹中的所有文件
-        for foldername, subfolders, filenames in os.walk(output_folder):
-            for filename in filenames:
-                # 获取文件的完整路径
-                file_path = os.path.join(foldername, filename)
-                # 获取相对于output_folder的路径
-                arcname = os.path.relpath(file_path, output_folder)
-                # 将文件添加到ZIP中
-                zipf.write(file_path, arcname)
+    # 本次生成的文件直接打包内存中的内容
+    with ZipPackager(zip_filename, level=STORED) as packager:
+        for arcname, data in generated_files.items():
+            packager.add(arcname, data)
+        if include_existing:
+            for foldername, subfolders, filenames in os.walk(output_folder):
+                for filename in filenames:
+                    file_path = os.path.join(foldername, filename)
+                    arcname = os.path.relpath(file_path, output_folder)
+                    if arcname not in generated_files:
+                        with open(file_path, 'rb') as f:
+                            packager.add(arcname, f)
     
     print(f"处理完成！文件已保存到：{zip_filename}")
 
 # 直接调用函数
 if __name__ == "__main__":
+    # 打包为exe后进程池需要
+    multiprocessing.freeze_support()
     process_excel_files()
@@ -1,11 +1,19 @@
 import os
-import json
+import sys
 import pandas as pd
 from datetime import datetime
 import re
+from functools import lru_cache
 from tkinter import Tk
 from tkinter.filedialog import askopenfilenames
 
+# 共享模块位于仓库的“工具”目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '工具'))
+from period_compare import PeriodComparison, add_months
+from table_cache import read_excel_cached
+from workload_store import SOURCE_NURSING, WorkloadStore
+from xlsx_writer import write_table
+
 def get_date_from_filename(filename):
     # 从文件名中提取日期
     match = re.search(r'(\d{4})\.(\d{2})', filename)
@@ -23,11 +31,6 @@ def format_sheet_name(date):
     # 格式化工作表名称
     return f"{date.year}年{date.month}月绩效-核算数据"
 
-def save_to_json(data, filename):
-    # 保存数据到JSON文件
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-
 def process_dataframe(df):
     # 重命名 'Unnamed: 0' 列为 '科室名称'
     if 'Unnamed: 0' in df.columns:
@@ -39,154 +42,119 @@ def process_dataframe(df):
     
     return df
 
-def get_latest_json_files():
-    # 获取当前目录下所有JSON文件
-    json_files = [f for f in os.listdir() if f.endswith('.json')]
-    
-    # 解析文件名中的日期
-    dated_files = []
-    for file in json_files:
-        try:
-            year, month = map(int, file.split('.')[0:2])
-            date = datetime(year, month, 1)
-            dated_files.append((date, file))
-        except:
-            continue
-    
-    # 按日期排序
-    dated_files.sort(key=lambda x: x[0], reverse=True)
-    
-    return dated_files[:2] if len(dated_files) >= 2 else []
+def get_latest_months(months):
+    # 取最近的两个月份（月份 -> 数据），不足两个时返回空列表
+    dates = sorted(months, reverse=True)
+    return dates[:2] if len(dates) >= 2 else []
 
-def get_data_from_performance_json(dept_name, data):
-    """从绩效数据中提取指定科室的工作量数据"""
-    dept_data = {}
-    
-    # 检查数据格式
-    sample_item = data[0] if data else None
-    if not sample_item:
-        return dept_data
-    
-    # 定义需要查找的字段和对应的关键词
-    field_keywords = {
-        '出院人次（护理）': '出院人次',
-        '年龄（护理）': '年龄',
-        '护士中医适宜技术（护理）': '护士中医适宜技术',
-        'Ⅱ级护理（护理）': 'Ⅱ级护理',
-        'Ⅰ级护理（护理）': 'Ⅰ级护理',
-        '出院患者占用床日（护理）': '出院患者占用床日'
-    }
-        
-    # 如果是绩效数据格式（包含"项目名称"字段）
-    if '项目名称' in sample_item:
-        for item in data:
-            if item['科室名称'] == dept_name:
-                item_name = item['项目名称']
-                # 对每个字段进行模糊匹配
-                for field, keyword in field_keywords.items():
-                    if keyword in item_name:
-                        dept_data[field] = item['工作量']
-                        break
-    # 如果是基础数据格式（直接包含指标字段）
+# 需要查找的字段和对应的关键词
+FIELD_KEYWORDS = {
+    '出院人次（护理）': '出院人次',
+    '年龄（护理）': '年龄',
+    '护士中医适宜技术（护理）': '护士中医适宜技术',
+    'Ⅱ级护理（护理）': 'Ⅱ级护理',
+    'Ⅰ级护理（护理）': 'Ⅰ级护理',
+    '出院患者占用床日（护理）': '出院患者占用床日'
+}
+FIELDS = list(FIELD_KEYWORDS)
+
+# 各科室报表中的行，按顺序输出：当前月、上月、去年同月
+# 可改为 'last6'（最近6个月）、'rolling3'（最近3个月合计）、'qtd'（本季度累计）等，见 period_compare
+REPORT_PERIODS = ['current', 'mom', 'yoy']
+# 对比行，排在各月份之后，例如 Comparison('同比增减', 'current', 'yoy', 'delta')
+REPORT_COMPARISONS = []
+
+@lru_cache(maxsize=None)
+def classify_item(item_name):
+    """项目名称对应的字段（模糊匹配，取第一个命中的关键词），不对应任何字段时返回 None；
+    每个不同的项目名称只匹配一次"""
+    for field, keyword in FIELD_KEYWORDS.items():
+        if keyword in str(item_name):
+            return field
+    return None
+
+def index_month(df):
+    """
+    把一个月的数据按科室整理为 {科室名称: {字段: 数值}}，之后按科室直接查字典。
+
+    绩效数据格式（包含“项目名称”列）按项目名称匹配字段，同一字段取最后一条；
+    基础数据格式（直接包含指标列）取科室第一次出现的行。
+    """
+    if df.empty or '科室名称' not in df.columns:
+        return {}
+
+    index = {}
+    if '项目名称' in df.columns:
+        fields = df['项目名称'].map(classify_item)
+        matched = pd.DataFrame({'科室名称': df['科室名称'], '字段': fields, '工作量': df['工作量']})
+        matched = matched[fields.notna()].drop_duplicates(subset=['科室名称', '字段'], keep='last')
+        for dept_name, group in matched.groupby('科室名称', sort=False):
+            index[dept_name] = dict(zip(group['字段'], group['工作量']))
     else:
-        dept_item = next((item for item in data if item['科室名称'] == dept_name), None)
-        if dept_item:
-            for field in field_keywords.keys():
-                if field in dept_item:
-                    dept_data[field] = dept_item[field]
-                    
-    return dept_data
+        columns = [field for field in FIELDS if field in df.columns]
+        first_rows = df.drop_duplicates(subset='科室名称', keep='first')
+        for record in first_rows[['科室名称'] + columns].to_dict(orient='records'):
+            dept_name = record.pop('科室名称')
+            index[dept_name] = record
+    return index
+
+def workload_facts(index):
+    """把 index_month 的结果展开为 (科室, 指标, 数值)，用于写入工作量数据库"""
+    for dept_name, dept_data in index.items():
+        for field, value in dept_data.items():
+            yield dept_name, field, value
+
+class MonthLoader:
+    """
+    本次运行的月份数据。
+
+    每个月份最多载入一次：本次读取的月份直接使用 index_month 的结果，其余月份
+    （如去年同月）第一次用到时从工作量数据库取出并缓存。
+    """
+
+    def __init__(self, indexes, store=None):
+        """
+        :param indexes: 本次读取的月份 -> {科室名称: {字段: 数值}}，至少两个月份
+        :param store: 工作量数据库，用于载入本次没有读取的月份
+        """
+        self.store = store
+        self._months = dict(indexes)
+        latest_months = get_latest_months(self._months)
+        self.current_date = latest_months[0]
 
-def create_department_excel(dept_name, current_data, performance_data, latest_files):
-    # 创建Excel文件
+        # 上月的数据取本次读取的第二个月份（即使两个文件的月份不相邻）
+        self._months.setdefault(add_months(self.current_date, -1), self._months[latest_months[1]])
+
+        # 数据库中的科室名称保存为文字，载入时换回当前月份中的科室名称
+        self._names = {str(name): name for name in self._months[self.current_date]}
+
+    def month(self, date):
+        """一个月份全部科室的数据，每个月份只载入一次"""
+        if date not in self._months:
+            values = {}
+            if self.store is not None:
+                values = self.store.period_values(SOURCE_NURSING, date.strftime('%Y.%m'))
+            self._months[date] = {self._names.get(name, name): data for name, data in values.items()}
+        return self._months[date]
+
+    def departments(self):
+        """当前月份的全部科室"""
+        return list(self.month(self.current_date))
+
+def create_department_excel(dept_name, frame):
+    """
+    生成一个科室的Excel文件。
+
+    :param frame: PeriodComparison.build 中该科室的报表（日期 + 各字段）
+    """
     output_dir = "护理工作量"
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         
     filename = os.path.join(output_dir, f"{dept_name}.xlsx")
-    writer = pd.ExcelWriter(filename, engine='openpyxl')
-    
-    # 获取当前日期
-    current_date = max(latest_files[0][0], latest_files[1][0])
     
-    # 准备数据
-    rows = []
-    
-    # 获取当前月数据
-    current_dept_data = next((item for item in current_data if item['科室名称'] == dept_name), None)
-    if current_dept_data:
-        row = {
-            '日期': current_date.strftime('%Y.%m'),
-            '出院人次（护理）': current_dept_data.get('出院人次（护理）', ''),
-            '年龄（护理）': current_dept_data.get('年龄（护理）', ''),
-            '护士中医适宜技术（护理）': current_dept_data.get('护士中医适宜技术（护理）', ''),
-            'Ⅱ级护理（护理）': current_dept_data.get('Ⅱ级护理（护理）', ''),
-            'Ⅰ级护理（护理）': current_dept_data.get('Ⅰ级护理（护理）', ''),
-            '出院患者占用床日（护理）': current_dept_data.get('出院患者占用床日（护理）', '')
-        }
-        rows.append(row)
-    
-    # 获取上月数据
-    last_month = datetime(current_date.year, current_date.month - 1 if current_date.month > 1 else 12, 1)
-    if current_date.month == 1:
-        last_month = last_month.replace(year=last_month.year - 1)
-    
-    # 获取去年同月数据
-    last_year = datetime(current_date.year - 1, current_date.month, 1)
-    
-    # 尝试读取去年同月的JSON文件
-    last_year_filename = f"{last_year.year}.{last_year.month:02d}.json"
-    if os.path.exists(last_year_filename):
-        with open(last_year_filename, 'r', encoding='utf-8') as f:
-            last_year_data = json.load(f)
-            last_year_dept_data = get_data_from_performance_json(dept_name, last_year_data)
-            if last_year_dept_data:
-                row = {
-                    '日期': last_year.strftime('%Y.%m'),
-                    **{k: last_year_dept_data.get(k, '') for k in [
-                        '出院人次（护理）', '年龄（护理）', '护士中医适宜技术（护理）',
-                        'Ⅱ级护理（护理）', 'Ⅰ级护理（护理）', '出院患者占用床日（护理）'
-                    ]}
-                }
-                rows.append(row)
-    
-    # 从performance_data中获取上月数据
-    dept_data = get_data_from_performance_json(dept_name, performance_data)
-    if dept_data:
-        row = {
-            '日期': last_month.strftime('%Y.%m'),
-            **{k: dept_data.get(k, '') for k in [
-                '出院人次（护理）', '年龄（护理）', '护士中医适宜技术（护理）',
-                'Ⅱ级护理（护理）', 'Ⅰ级护理（护理）', '出院患者占用床日（护理）'
-            ]}
-        }
-        rows.append(row)
-    
-    # 创建DataFrame并保存到Excel
-    if rows:
-        # 将日期字符串转换为datetime对象进行排序
-        for row in rows:
-            year, month = map(int, row['日期'].split('.'))
-            row['_date'] = datetime(year, month, 1)
-        
-        # 按日期降序排序
-        rows.sort(key=lambda x: x['_date'], reverse=True)
-        
-        # 删除临时日期字段
-        for row in rows:
-            del row['_date']
-            
-        df = pd.DataFrame(rows)
-        df.to_excel(writer, sheet_name='Sheet1', index=False)
-        
-        # 获取工作表对象
-        worksheet = writer.sheets['Sheet1']
-        
-        # 设置所有列的宽度为20
-        for column in worksheet.columns:
-            worksheet.column_dimensions[column[0].column_letter].width = 20
-    
-    writer.close()
+    # 设置所有列的宽度为20
+    write_table(filename, 'Sheet1', frame.columns, frame.itertuples(index=False), width=20)
 
 def main():
     # 创建Tk根窗口
@@ -229,59 +197,47 @@ def main():
     current_date = max(current_dates)
     previous_date = get_previous_year_date(current_date)
     
-    # 处理工作量文件
-    for file in workload_files:
-        filename = os.path.basename(file)
-        file_date = get_date_from_filename(filename)
-        
-        if file_date:
-            df = pd.read_excel(file)
-            df = process_dataframe(df)  # 处理数据框
-            output_filename = f"{file_date.year}.{file_date.month:02d}.json"
-            save_to_json(df.to_dict(orient='records'), output_filename)
-            print(f"已保存工作量数据到: {output_filename}")
-    
-    # 处理护理绩效数据文件
-    sheet_name = format_sheet_name(previous_date)
-    try:
-        df = pd.read_excel(nursing_performance_file, sheet_name=sheet_name)
-        df = process_dataframe(df)  # 处理数据框
-        output_filename = f"{previous_date.year}.{previous_date.month:02d}.json"
-        save_to_json(df.to_dict(orient='records'), output_filename)
-        print(f"已保存护理绩效数据到: {output_filename}")
-    except Exception as e:
-        print(f"处理护理绩效数据时出错: {str(e)}")
+    # 本次读取的各月份按科室整理后的数据：月份 -> {科室名称: {字段: 数值}}，只保存在内存中
+    # （源文件的解析结果由 read_excel_cached 缓存，下次运行直接载入）
+    indexes = {}
 
-    # 获取最新的两个JSON文件
-    latest_files = get_latest_json_files()
-    if len(latest_files) < 2:
-        print("找不到足够的JSON文件")
-        return
-    
-    # 读取当前月份数据
-    with open(latest_files[0][1], 'r', encoding='utf-8') as f:
-        current_data = json.load(f)
-    
-    # 读取上月绩效数据
-    with open(latest_files[1][1], 'r', encoding='utf-8') as f:
-        performance_data = json.load(f)
-    
-    # 获取所有科室名称
-    departments = set(item['科室名称'] for item in current_data)
-    
-    # 为每个科室创建Excel文件
-    for dept in departments:
-        create_department_excel(dept, current_data, performance_data, latest_files)
-        print(f"已生成科室 {dept} 的Excel文件")
-    
-    # 删除所有JSON文件
-    json_files = [f for f in os.listdir() if f.endswith('.json')]
-    for file in json_files:
+    # 各月份的数据同时写入工作量数据库，以后运行时可以直接取用历史月份
+    with WorkloadStore() as store:
+        # 处理工作量文件
+        for file in workload_files:
+            filename = os.path.basename(file)
+            file_date = get_date_from_filename(filename)
+        
+            if file_date:
+                df = read_excel_cached(file)
+                df = process_dataframe(df)  # 处理数据框
+                indexes[file_date] = index_month(df)
+                store.replace_period(SOURCE_NURSING, file_date.strftime('%Y.%m'), workload_facts(indexes[file_date]))
+                print(f"已读取工作量数据: {file_date.strftime('%Y.%m')}")
+    
+        # 处理护理绩效数据文件
+        sheet_name = format_sheet_name(previous_date)
         try:
-            os.remove(file)
-            print(f"已删除文件: {file}")
+            df = read_excel_cached(nursing_performance_file, sheet_name=sheet_name)
+            df = process_dataframe(df)  # 处理数据框
+            indexes[previous_date] = index_month(df)
+            store.replace_period(SOURCE_NURSING, previous_date.strftime('%Y.%m'), workload_facts(indexes[previous_date]))
+            print(f"已读取护理绩效数据: {previous_date.strftime('%Y.%m')}")
         except Exception as e:
-            print(f"删除文件 {file} 时出错: {str(e)}")
+            print(f"处理护理绩效数据时出错: {str(e)}")
+
+        # 最近的两个月份
+        if len(get_latest_months(indexes)) < 2:
+            print("找不到足够的月份数据")
+            return
+        loader = MonthLoader(indexes, store)
+        sheets = PeriodComparison(REPORT_PERIODS, REPORT_COMPARISONS).build(
+            loader.month, loader.current_date, FIELDS)
+    
+        # 为每个科室创建Excel文件
+        for dept in loader.departments():
+            create_department_excel(dept, sheets[dept])
+            print(f"已生成科室 {dept} 的Excel文件")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,190 @@
+"""
+基于模板的批量Word文档生成
+
+.docx 模板中用 {{名称}} 标记要填写的位置。模板只编译一次：把 word/document.xml
+的正文切分成固定的XML片段和占位符，之后每份文档只做字符串拼接和转义，不再逐段
+调用 python-docx 创建 lxml 元素。
+
+- 普通占位符 {{名称}} 替换为转义后的文字；
+- 整段只有一个占位符、且名称在 list_fields 中的段落是“列表段落”，按给定的每行
+  文字复制该段落（保留段落和字体格式），列表为空时整段删除。
+
+同一份数据每次生成的文档逐字节相同（固定的ZIP条目顺序和时间戳），内容未变的
+文档可以据此跳过写盘。
+"""
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from zip_packager import DEFAULT_LEVEL, ZipPackager
+
+DOCUMENT_PART = 'word/document.xml'
+
+_PLACEHOLDER_RE = re.compile(r'\{\{(.+?)\}\}')
+_PARAGRAPH_RE = re.compile(r'<w:p(?: [^>]*)?/>|<w:p(?: [^>]*[^/>])?>.*?</w:p>', re.S)
+_RUN_TEXT_RE = re.compile(r'(<w:t(?: [^>]*)?>)(.*?)(</w:t>)', re.S)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+# 少于该数量的文档不值得启动进程池
+PARALLEL_THRESHOLD = 16
+
+
+def _paragraph_text(paragraph):
+    return ''.join(text for _, text, _ in _RUN_TEXT_RE.findall(paragraph))
+
+
+def _merge_split_placeholders(paragraph):
+    """Word 常把 {{名称}} 拆到几个文本段中；此时把整段文字合并到第一个文本段"""
+    texts = [text for _, text, _ in _RUN_TEXT_RE.findall(paragraph)]
+    full_text = ''.join(texts)
+    intact = sum(len(_PLACEHOLDER_RE.findall(text)) for text in texts)
+    if intact == len(_PLACEHOLDER_RE.findall(full_text)):
+        return paragraph
+    first = [True]
+
+    def replace(match):
+        if first[0]:
+            first[0] = False
+            return f'<w:t xml:space="preserve">{full_text}</w:t>'
+        return ''
+
+    return _RUN_TEXT_RE.sub(replace, paragraph)
+
+
+class DocxTemplate:
+    """编译后的模板：ZIP中其他部件原样保留，正文切分为片段"""
+
+    def __init__(self, data, list_fields=()):
+        """
+        :param data: 模板 .docx 的字节
+        :param list_fields: 作为列表段落处理的占位符名称
+        """
+        self.parts = []  # (部件名, 字节)，保持模板中的顺序
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for info in archive.infolist():
+                self.parts.append((info.filename, archive.read(info.filename)))
+        document = dict(self.parts)[DOCUMENT_PART].decode('utf-8')
+
+        body_start = document.index('<w:body>') + len('<w:body>')
+        body_end = document.rindex('<w:sectPr', body_start) if '<w:sectPr' in document[body_start:] \
+            else document.rindex('</w:body>')
+        self.prefix = document[:body_start]
+        self.suffix = document[body_end:]
+        self.segments = self._compile(document[body_start:body_end], set(list_fields))
+        self.fields = sorted({segment[1] for segment in self.segments if segment[0] != 'text'})
+
+    @staticmethod
+    def _compile(block, list_fields):
+        segments = []
+        position = 0
+        for match in _PARAGRAPH_RE.finditer(block):
+            segments.extend(DocxTemplate._compile_text(block[position:match.start()]))
+            paragraph = _merge_split_placeholders(match.group(0))
+            only = _PLACEHOLDER_RE.fullmatch(_paragraph_text(paragraph).strip())
+            if only and only.group(1) in list_fields:
+                # 列表段落：占位符所在文本段之前/之后的XML作为每行的外壳
+                before, after = paragraph.split(only.group(0), 1)
+                before = re.sub(r'<w:t(?: [^>]*)?>$', '<w:t xml:space="preserve">', before)
+                segments.append(('list', only.group(1), before, after))
+            else:
+                segments.extend(DocxTemplate._compile_text(paragraph))
+            position = match.end()
+        segments.extend(DocxTemplate._compile_text(block[position:]))
+        return segments
+
+    @staticmethod
+    def _compile_text(xml):
+        segments = []
+        position = 0
+        for match in _PLACEHOLDER_RE.finditer(xml):
+            if match.start() > position:
+                segments.append(('text', xml[position:match.start()]))
+            # 占位符名称中可能残留格式标签（拼写检查标记等），只取文字
+            segments.append(('field', _TAG_RE.sub('', match.group(1))))
+            position = match.end()
+        if position < len(xml):
+            segments.append(('text', xml[position:]))
+        return segments
+
+    def render_body(self, values):
+        """把一组数据填入正文，返回正文XML（不含 <w:body> 和节属性）"""
+        out = []
+        for segment in self.segments:
+            kind = segment[0]
+            if kind == 'text':
+                out.append(segment[1])
+            elif kind == 'field':
+                value = values.get(segment[1], '')
+                out.append(escape('' if value is None else str(value)))
+            else:
+                _, name, before, after = segment
+                for line in values.get(name) or ():
+                    out.append(before + escape(str(line)) + after)
+        return ''.join(out)
+
+    def build(self, bodies, level=DEFAULT_LEVEL):
+        """把一段或多段正文XML组装成完整的 .docx 字节"""
+        document = (self.prefix + ''.join(bodies) + self.suffix).encode('utf-8')
+        buffer = io.BytesIO()
+        with ZipPackager(buffer, level=level, workers=1) as packager:
+            for name, data in self.parts:
+                packager.add(name, document if name == DOCUMENT_PART else data)
+        return buffer.getvalue()
+
+    def render(self, values):
+        """生成一份文档"""
+        return self.build([self.render_body(values)])
+
+    def render_combined(self, items):
+        """把多组数据依次填入同一份文档"""
+        return self.build(self.render_body(values) for values in items)
+
+
+# 进程池中的每个工作进程只接收一次编译好的模板
+_worker_template = None
+
+
+def _init_worker(template):
+    global _worker_template
+    _worker_template = template
+
+
+def _render_in_worker(item):
+    key, values = item
+    return key, _worker_template.render(values)
+
+
+def render_many(template, items, workers=None):
+    """
+    为每组数据分别生成文档，依次产出 (键, .docx字节)。
+
+    :param items: (键, 数据) 序列
+    :param workers: 进程数；数量较少或 workers=1 时在当前进程中生成
+    """
+    items = list(items)
+    if workers == 1 or len(items) < PARALLEL_THRESHOLD:
+        for key, values in items:
+            yield key, template.render(values)
+        return
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(items) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(template,)) as executor:
+        yield from executor.map(_render_in_worker, items, chunksize=chunksize)
+
+
+def write_if_changed(path, data):
+    """内容与已有文件相同时不写入，返回是否写入了文件"""
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True
@@ -0,0 +1,1366 @@
+"""
+纯Python的Excel公式计算引擎
+
+加载 .xlsm/.xlsx 模板，解析其中的公式并建立单元格依赖图，按拓扑顺序计算，
+最后把计算结果写成只保留数值的 .xlsx 文件。用于在没有安装 Excel 的机器上
+替代 win32com 的 CalculateFull() + “数值粘贴”流程。
+
+支持的函数为模板实际用到的子集：
+SUM/SUMIF/AVERAGE/VLOOKUP/INDEX/MATCH/IF/IFERROR/ROUND/LEFT/LEN/TEXT/
+TODAY/NOW/YEAR/MONTH 等，以及同表、跨表和 [n]Sheet!A:B 形式的跨工作簿引用。
+模板中的 VBA 自定义函数需要由调用方以 Python 函数的形式注册。
+"""
+import os
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
+from graphlib import CycleError, TopologicalSorter
+
+import openpyxl
+from openpyxl.utils import column_index_from_string
+from openpyxl.worksheet.formula import ArrayFormula
+
+from xlsx_freezer import freeze_workbook
+
+
+class ExcelError:
+    """Excel错误值（#N/A、#VALUE! 等），作为普通值在公式之间传递"""
+
+    def __init__(self, code):
+        self.code = code
+
+    def __repr__(self):
+        return self.code
+
+    __str__ = __repr__
+
+
+NA = ExcelError('#N/A')
+VALUE = ExcelError('#VALUE!')
+REF = ExcelError('#REF!')
+DIV0 = ExcelError('#DIV/0!')
+NAME = ExcelError('#NAME?')
+NUM = ExcelError('#NUM!')
+NULL = ExcelError('#NULL!')
+
+ERRORS = {e.code: e for e in (NA, VALUE, REF, DIV0, NAME, NUM, NULL)}
+
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+
+# ---------------------------------------------------------------------------
+# 值转换
+# ---------------------------------------------------------------------------
+
+def to_number(value):
+    """按Excel规则把值转换为数字，无法转换时返回 #VALUE!"""
+    if isinstance(value, ExcelError):
+        return value
+    if value is None:
+        return 0.0
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return (value - EXCEL_EPOCH).total_seconds() / 86400
+    if isinstance(value, date):
+        return float((value - EXCEL_EPOCH.date()).days)
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            return VALUE
+    return VALUE
+
+
+def to_text(value):
+    """按Excel“常规”格式把值转换为文本"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (date, datetime)):
+        value = to_number(value)
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        return format(value, '.15g')
+    return str(value)
+
+
+def to_bool(value):
+    if isinstance(value, ExcelError):
+        return value
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        if value.upper() in ('TRUE', 'FALSE'):
+            return value.upper() == 'TRUE'
+        return VALUE
+    number = to_number(value)
+    if isinstance(number, ExcelError):
+        return number
+    return number != 0
+
+
+def excel_round(number, digits=0):
+    """四舍五入（远离零），与Excel的ROUND一致"""
+    quantum = Decimal(1).scaleb(-int(digits))
+    return float(Decimal(repr(float(number))).quantize(quantum, rounding=ROUND_HALF_UP))
+
+
+def _type_rank(value):
+    # Excel比较规则：数字 < 文本 < 逻辑值
+    if isinstance(value, bool):
+        return 2
+    if isinstance(value, str):
+        return 1
+    return 0
+
+
+def compare(left, right):
+    """按Excel规则比较两个值，返回 -1/0/1"""
+    if isinstance(left, (date, datetime)):
+        left = to_number(left)
+    if isinstance(right, (date, datetime)):
+        right = to_number(right)
+    if left is None:
+        left = '' if isinstance(right, str) else (False if isinstance(right, bool) else 0)
+    if right is None:
+        right = '' if isinstance(left, str) else (False if isinstance(left, bool) else 0)
+    left_rank, right_rank = _type_rank(left), _type_rank(right)
+    if left_rank != right_rank:
+        return -1 if left_rank < right_rank else 1
+    if left_rank == 1:
+        left, right = left.casefold(), right.casefold()
+    return (left > right) - (left < right)
+
+
+def _lookup_key(value):
+    """查找用的归一化键：文本不区分大小写，数字统一为浮点"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return ('b', value)
+    if isinstance(value, str):
+        return ('s', value.casefold())
+    if isinstance(value, (int, float, date, datetime)):
+        return ('n', float(to_number(value)))
+    return None
+
+
+def _wildcard_pattern(text):
+    """把Excel通配符（* ? ~）转换为正则表达式"""
+    pattern = ''
+    escaped = False
+    for char in text:
+        if escaped:
+            pattern += re.escape(char)
+            escaped = False
+        elif char == '~':
+            escaped = True
+        elif char == '*':
+            pattern += '.*'
+        elif char == '?':
+            pattern += '.'
+        else:
+            pattern += re.escape(char)
+    return re.compile(pattern + r'\Z', re.IGNORECASE | re.DOTALL)
+
+
+def _has_wildcard(value):
+    return isinstance(value, str) and ('*' in value or '?' in value)
+
+
+# ---------------------------------------------------------------------------
+# 区域
+# ---------------------------------------------------------------------------
+
+class RangeRef:
+    """对某个工作表矩形区域的引用，函数通过它按需读取单元格的值"""
+
+    __slots__ = ('sheet', 'min_row', 'min_col', 'max_row', 'max_col')
+
+    def __init__(self, sheet, min_row, min_col, max_row, max_col):
+        self.sheet = sheet
+        self.min_row = min_row
+        self.min_col = min_col
+        self.max_row = max_row
+        self.max_col = max_col
+
+    @property
+    def height(self):
+        return self.max_row - self.min_row + 1
+
+    @property
+    def width(self):
+        return self.max_col - self.min_col + 1
+
+    @property
+    def key(self):
+        return (id(self.sheet), self.min_row, self.min_col, self.max_row, self.max_col)
+
+    def value(self, row_offset=0, col_offset=0):
+        return self.sheet.cells.get((self.min_row + row_offset, self.min_col + col_offset))
+
+    def values(self):
+        cells = self.sheet.cells
+        for row in range(self.min_row, self.max_row + 1):
+            for col in range(self.min_col, self.max_col + 1):
+                yield cells.get((row, col))
+
+    def vector(self):
+        """一维区域（单行或单列）的值列表"""
+        cells = self.sheet.cells
+        if self.width == 1:
+            return [cells.get((row, self.min_col)) for row in range(self.min_row, self.max_row + 1)]
+        return [cells.get((self.min_row, col)) for col in range(self.min_col, self.max_col + 1)]
+
+    def column(self, col_offset):
+        cells = self.sheet.cells
+        col = self.min_col + col_offset
+        return [cells.get((row, col)) for row in range(self.min_row, self.max_row + 1)]
+
+
+def scalar(value):
+    """把区域参数降为单个值（单个单元格），多单元格区域返回 #VALUE!"""
+    if isinstance(value, RangeRef):
+        if value.height == 1 and value.width == 1:
+            return value.value()
+        return VALUE
+    return value
+
+
+# ---------------------------------------------------------------------------
+# 词法与语法分析
+# ---------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<error>\#N/A|\#VALUE!|\#DIV/0!|\#NAME\?|\#NUM!|\#NULL!|\#REF!)
+  | (?P<ref>
+        (?:(?:\[(?P<link>\d+)\])?
+           (?:'(?P<qsheet>(?:[^']|'')+)'|(?P<sheet>[^\s!'"(),:;+\-*/^&=<>%{}\[\]]+))!)?
+        (?:(?P<ref_error>\#REF!)
+          |(?P<c1>\$?[A-Za-z]{1,3})(?P<r1>\$?\d+)(?::(?P<c2>\$?[A-Za-z]{1,3})(?P<r2>\$?\d+))?(?![\w(])
+          |(?P<col1>\$?[A-Za-z]{1,3}):(?P<col2>\$?[A-Za-z]{1,3})(?![\w(])))
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<func>(?:_xlfn\.)?[A-Za-z_\u4e00-\u9fff][\w.]*)\(
+  | (?P<bool>TRUE|FALSE)(?![\w(])
+  | (?P<name>[A-Za-z_\u4e00-\u9fff][\w.]*)
+  | (?P<op><>|<=|>=|[-+*/^&=<>%(),])
+''', re.VERBOSE)
+
+
+class FormulaError(ValueError):
+    """公式无法解析"""
+
+
+def tokenize(formula):
+    tokens = []
+    pos = 0
+    while pos < len(formula):
+        match = _TOKEN_RE.match(formula, pos)
+        if not match:
+            raise FormulaError(f"无法解析公式: ={formula}（位置 {pos}）")
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == 'ws':
+            continue
+        if kind == 'ref' or match.group('ref') is not None:
+            tokens.append(('ref', _ref_node(match)))
+        elif kind == 'string':
+            tokens.append(('str', match.group('string')[1:-1].replace('""', '"')))
+        elif kind == 'error':
+            tokens.append(('error', ERRORS[match.group('error')]))
+        elif kind == 'number':
+            tokens.append(('num', float(match.group('number'))))
+        elif match.group('func') is not None:
+            name = match.group('func').upper()
+            if name.startswith('_XLFN.'):
+                name = name[6:]
+            tokens.append(('func', name))
+        elif kind == 'bool':
+            tokens.append(('bool', match.group('bool') == 'TRUE'))
+        elif kind == 'name':
+            tokens.append(('error', NAME))
+        else:
+            tokens.append(('op', match.group('op')))
+    return tokens
+
+
+def _ref_node(match):
+    link = match.group('link')
+    sheet = match.group('sheet')
+    if match.group('qsheet') is not None:
+        sheet = match.group('qsheet').replace("''", "'")
+    link = int(link) if link else None
+    if match.group('ref_error'):
+        return ('error', REF)
+    if match.group('c1'):
+        min_col = column_index_from_string(match.group('c1').lstrip('$').upper())
+        min_row = int(match.group('r1').lstrip('$'))
+        if match.group('c2'):
+            max_col = column_index_from_string(match.group('c2').lstrip('$').upper())
+            max_row = int(match.group('r2').lstrip('$'))
+        else:
+            max_col, max_row = min_col, min_row
+        min_row, max_row = sorted((min_row, max_row))
+        min_col, max_col = sorted((min_col, max_col))
+    else:
+        min_col = column_index_from_string(match.group('col1').lstrip('$').upper())
+        max_col = column_index_from_string(match.group('col2').lstrip('$').upper())
+        min_col, max_col = sorted((min_col, max_col))
+        min_row = max_row = None  # 整列引用
+    return ('ref', link, sheet, min_row, min_col, max_row, max_col)
+
+
+class _Parser:
+    """递归下降解析器，按Excel运算符优先级生成语法树（元组）"""
+
+    _COMPARISONS = ('=', '<>', '<', '>', '<=', '>=')
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expect(self, op):
+        token = self.take()
+        if token != ('op', op):
+            raise FormulaError(f"缺少 '{op}'")
+
+    def parse(self):
+        node = self.comparison()
+        if self.pos != len(self.tokens):
+            raise FormulaError(f"多余的内容: {self.peek()[1]}")
+        return node
+
+    def comparison(self):
+        node = self.concat()
+        while self.peek()[0] == 'op' and self.peek()[1] in self._COMPARISONS:
+            node = ('binop', self.take()[1], node, self.concat())
+        return node
+
+    def concat(self):
+        node = self.additive()
+        while self.peek() == ('op', '&'):
+            self.take()
+            node = ('binop', '&', node, self.additive())
+        return node
+
+    def additive(self):
+        node = self.multiplicative()
+        while self.peek()[0] == 'op' and self.peek()[1] in ('+', '-'):
+            node = ('binop', self.take()[1], node, self.multiplicative())
+        return node
+
+    def multiplicative(self):
+        node = self.power()
+        while self.peek()[0] == 'op' and self.peek()[1] in ('*', '/'):
+            node = ('binop', self.take()[1], node, self.power())
+        return node
+
+    def power(self):
+        node = self.unary()
+        while self.peek() == ('op', '^'):
+            self.take()
+            node = ('binop', '^', node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek()[0] == 'op' and self.peek()[1] in ('-', '+'):
+            op = self.take()[1]
+            operand = self.unary()
+            return ('neg', operand) if op == '-' else ('pos', operand)
+        return self.postfix()
+
+    def postfix(self):
+        node = self.primary()
+        while self.peek() == ('op', '%'):
+            self.take()
+            node = ('percent', node)
+        return node
+
+    def primary(self):
+        kind, value = self.take()
+        if kind in ('num', 'str', 'bool', 'error'):
+            return (kind, value)
+        if kind == 'ref':
+            return value
+        if kind == 'func':
+            args = []
+            if self.peek() == ('op', ')'):
+                self.take()
+                return ('func', value, args)
+            while True:
+                if self.peek()[0] == 'op' and self.peek()[1] in (',', ')'):
+                    args.append(('missing',))
+                else:
+                    args.append(self.comparison())
+                kind, sep = self.take()
+                if sep == ')':
+                    return ('func', value, args)
+                if sep != ',':
+                    raise FormulaError("函数参数之间缺少 ','")
+        if (kind, value) == ('op', '('):
+            node = self.comparison()
+            self.expect(')')
+            return node
+        raise FormulaError(f"意外的符号: {value}")
+
+
+def parse_formula(formula):
+    """解析不带前导 '=' 的公式文本"""
+    return _Parser(tokenize(formula)).parse()
+
+
+def iter_refs(node):
+    """遍历语法树中的全部引用节点"""
+    if node[0] == 'ref':
+        yield node
+    elif node[0] == 'func':
+        for arg in node[2]:
+            yield from iter_refs(arg)
+    elif node[0] == 'binop':
+        yield from iter_refs(node[2])
+        yield from iter_refs(node[3])
+    elif node[0] in ('neg', 'pos', 'percent'):
+        yield from iter_refs(node[1])
+
+
+# ---------------------------------------------------------------------------
+# 运算符
+# ---------------------------------------------------------------------------
+
+def _arith(op, left, right):
+    left, right = to_number(scalar(left)), to_number(scalar(right))
+    if isinstance(left, ExcelError):
+        return left
+    if isinstance(right, ExcelError):
+        return right
+    if op == '+':
+        return left + right
+    if op == '-':
+        return left - right
+    if op == '*':
+        return left * right
+    if op == '/':
+        return DIV0 if right == 0 else left / right
+    try:
+        return float(left) ** right
+    except (OverflowError, ZeroDivisionError):
+        return NUM
+
+
+def _binop(op, left, right):
+    if op in ('+', '-', '*', '/', '^'):
+        return _arith(op, left, right)
+    left, right = scalar(left), scalar(right)
+    if isinstance(left, ExcelError):
+        return left
+    if isinstance(right, ExcelError):
+        return right
+    if op == '&':
+        return to_text(left) + to_text(right)
+    result = compare(left, right)
+    if op == '=':
+        return result == 0
+    if op == '<>':
+        return result != 0
+    if op == '<':
+        return result < 0
+    if op == '>':
+        return result > 0
+    if op == '<=':
+        return result <= 0
+    return result >= 0
+
+
+# ---------------------------------------------------------------------------
+# 内置函数
+# ---------------------------------------------------------------------------
+
+def _numbers(args):
+    """SUM/AVERAGE 等的取数规则：区域中只取数字，直接参数按数字转换"""
+    for arg in args:
+        if isinstance(arg, RangeRef):
+            for value in arg.values():
+                if isinstance(value, ExcelError):
+                    yield value
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    yield value
+        elif arg is not None:
+            yield to_number(arg)
+
+
+def fn_sum(*args):
+    total = 0.0
+    for value in _numbers(args):
+        if isinstance(value, ExcelError):
+            return value
+        total += value
+    return total
+
+
+def fn_average(*args):
+    values = []
+    for value in _numbers(args):
+        if isinstance(value, ExcelError):
+            return value
+        values.append(value)
+    return sum(values) / len(values) if values else DIV0
+
+
+def fn_max(*args):
+    values = list(_numbers(args))
+    for value in values:
+        if isinstance(value, ExcelError):
+            return value
+    return max(values) if values else 0.0
+
+
+def fn_min(*args):
+    values = list(_numbers(args))
+    for value in values:
+        if isinstance(value, ExcelError):
+            return value
+    return min(values) if values else 0.0
+
+
+def fn_abs(number):
+    number = to_number(scalar(number))
+    return number if isinstance(number, ExcelError) else abs(number)
+
+
+def fn_round(number, digits=0.0):
+    number, digits = to_number(scalar(number)), to_number(scalar(digits))
+    if isinstance(number, ExcelError):
+        return number
+    if isinstance(digits, ExcelError):
+        return digits
+    return excel_round(number, int(digits))
+
+
+def fn_if(condition, if_true=lambda: True, if_false=lambda: False):
+    flag = to_bool(scalar(condition()))
+    if isinstance(flag, ExcelError):
+        return flag
+    return if_true() if flag else if_false()
+
+
+def fn_iferror(value, value_if_error):
+    result = scalar(value())
+    if isinstance(result, ExcelError):
+        return scalar(value_if_error())
+    return result
+
+
+def fn_ifna(value, value_if_na):
+    result = scalar(value())
+    if result is NA:
+        return scalar(value_if_na())
+    return result
+
+
+def fn_and(*args):
+    result = True
+    for arg in args:
+        values = arg.values() if isinstance(arg, RangeRef) else [arg]
+        for value in values:
+            flag = to_bool(value)
+            if isinstance(flag, ExcelError):
+                return flag
+            result = result and flag
+    return result
+
+
+def fn_or(*args):
+    result = False
+    for arg in args:
+        values = arg.values() if isinstance(arg, RangeRef) else [arg]
+        for value in values:
+            flag = to_bool(value)
+            if isinstance(flag, ExcelError):
+                return flag
+            result = result or flag
+    return result
+
+
+def fn_not(value):
+    flag = to_bool(scalar(value))
+    return flag if isinstance(flag, ExcelError) else not flag
+
+
+def fn_left(text, count=1.0):
+    text, count = scalar(text), to_number(scalar(count))
+    if isinstance(text, ExcelError):
+        return text
+    if isinstance(count, ExcelError):
+        return count
+    if count < 0:
+        return VALUE
+    return to_text(text)[:int(count)]
+
+
+def fn_right(text, count=1.0):
+    text, count = scalar(text), to_number(scalar(count))
+    if isinstance(text, ExcelError):
+        return text
+    if isinstance(count, ExcelError):
+        return count
+    if count < 0:
+        return VALUE
+    text = to_text(text)
+    return text[len(text) - int(count):] if count else ''
+
+
+def fn_len(text):
+    text = scalar(text)
+    if isinstance(text, ExcelError):
+        return text
+    return float(len(to_text(text)))
+
+
+def fn_today():
+    return datetime.combine(date.today(), datetime.min.time())
+
+
+def fn_now():
+    return datetime.now()
+
+
+def _as_datetime(value):
+    value = scalar(value)
+    if isinstance(value, ExcelError):
+        return value
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    number = to_number(value)
+    if isinstance(number, ExcelError):
+        return number
+    return openpyxl.utils.datetime.from_excel(number)
+
+
+def fn_year(value):
+    value = _as_datetime(value)
+    return value if isinstance(value, ExcelError) else float(value.year)
+
+
+def fn_month(value):
+    value = _as_datetime(value)
+    return value if isinstance(value, ExcelError) else float(value.month)
+
+
+def fn_day(value):
+    value = _as_datetime(value)
+    return value if isinstance(value, ExcelError) else float(value.day)
+
+
+_DATE_TOKEN_RE = re.compile(r'yyyy|yy|mm|m|dd|d|hh|h|ss|s|"[^"]*"|.', re.IGNORECASE)
+_NUMBER_FORMAT_RE = re.compile(r'^[#0,]*(?:\.(0+))?(%?)$')
+
+
+def fn_text(value, format_text):
+    value, format_text = scalar(value), scalar(format_text)
+    if isinstance(value, ExcelError):
+        return value
+    format_text = to_text(format_text)
+    number_format = _NUMBER_FORMAT_RE.match(format_text)
+    if number_format and not isinstance(value, (date, datetime)):
+        number = to_number(value)
+        if isinstance(number, ExcelError):
+            return to_text(value)
+        decimals = len(number_format.group(1) or '')
+        if number_format.group(2):
+            number *= 100
+        text = format(excel_round(number, decimals), f'.{decimals}f')
+        return text + number_format.group(2)
+    moment = _as_datetime(value)
+    if isinstance(moment, ExcelError):
+        return moment
+    tokens = _DATE_TOKEN_RE.findall(format_text)
+    parts = []
+    for index, token in enumerate(tokens):
+        lower = token.lower()
+        if lower in ('m', 'mm'):
+            # “m”紧跟在小时之后或紧挨着秒之前时表示分钟
+            previous = next((t.lower() for t in reversed(tokens[:index]) if t.lower()[0] in 'ymdhs'), '')
+            following = next((t.lower() for t in tokens[index + 1:] if t.lower()[0] in 'ymdhs'), '')
+            if previous.startswith('h') or following.startswith('s'):
+                parts.append(f'{moment.minute:0{len(lower)}d}')
+            else:
+                parts.append(f'{moment.month:0{len(lower)}d}')
+        elif lower == 'yyyy':
+            parts.append(f'{moment.year:04d}')
+        elif lower == 'yy':
+            parts.append(f'{moment.year % 100:02d}')
+        elif lower in ('d', 'dd'):
+            parts.append(f'{moment.day:0{len(lower)}d}')
+        elif lower in ('h', 'hh'):
+            parts.append(f'{moment.hour:0{len(lower)}d}')
+        elif lower in ('s', 'ss'):
+            parts.append(f'{moment.second:0{len(lower)}d}')
+        elif token.startswith('"'):
+            parts.append(token[1:-1])
+        else:
+            parts.append(token)
+    return ''.join(parts)
+
+
+def _criteria_predicate(criteria):
+    """把SUMIF的条件（如 ">5"、"<>--"、"科*"）转换为判断函数"""
+    if isinstance(criteria, str):
+        match = re.match(r'^(<>|<=|>=|=|<|>)?(.*)$', criteria, re.DOTALL)
+        op, operand = match.group(1) or '=', match.group(2)
+        number = to_number(operand) if operand.strip() else VALUE
+        if not isinstance(number, ExcelError):
+            operand = number
+        elif op in ('=', '<>') and _has_wildcard(operand):
+            pattern = _wildcard_pattern(operand)
+            if op == '=':
+                return lambda v: isinstance(v, str) and bool(pattern.match(v))
+            return lambda v: not (isinstance(v, str) and pattern.match(v))
+        elif op == '=' and operand == '':
+            return lambda v: v is None or v == ''
+    else:
+        op, operand = '=', criteria
+
+    def predicate(value):
+        if value is None or isinstance(value, ExcelError):
+            return op == '<>'
+        if _type_rank(value) != _type_rank(operand):
+            return op == '<>'
+        result = compare(value, operand)
+        return {'=': result == 0, '<>': result != 0, '<': result < 0,
+                '>': result > 0, '<=': result <= 0, '>=': result >= 0}[op]
+
+    return predicate
+
+
+def fn_sumif(criteria_range, criteria, sum_range=None):
+    criteria = scalar(criteria)
+    if isinstance(criteria, ExcelError):
+        return criteria
+    if isinstance(criteria_range, ExcelError):
+        return criteria_range
+    if not isinstance(criteria_range, RangeRef):
+        return VALUE
+    if sum_range is None:
+        sum_range = criteria_range
+    if not isinstance(sum_range, RangeRef):
+        return VALUE
+    predicate = _criteria_predicate(criteria)
+    total = 0.0
+    for row in range(criteria_range.height):
+        for col in range(criteria_range.width):
+            if predicate(criteria_range.value(row, col)):
+                value = sum_range.value(row, col)
+                if isinstance(value, ExcelError):
+                    return value
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    total += value
+    return total
+
+
+class _Lookups:
+    """精确查找的索引缓存
+
+    依赖图保证被查找区域中的公式单元格都已先行计算，区域的值在本轮计算中
+    不会再变化，因此每个区域只需建立一次“值→位置”索引。
+    """
+
+    def __init__(self):
+        self._indexes = {}
+
+    def exact(self, values_key, values, needle):
+        if _has_wildcard(needle):
+            pattern = _wildcard_pattern(needle)
+            for position, value in enumerate(values()):
+                if isinstance(value, str) and pattern.match(value):
+                    return position
+            return None
+        index = self._indexes.get(values_key)
+        if index is None:
+            index = {}
+            for position, value in enumerate(values()):
+                key = _lookup_key(value)
+                if key is not None and key not in index:
+                    index[key] = position
+            self._indexes[values_key] = index
+        return index.get(_lookup_key(needle))
+
+    def clear(self):
+        self._indexes.clear()
+
+
+def _approximate(values, needle, descending=False):
+    """近似匹配：升序时取不大于查找值的最后一项，降序时取不小于查找值的最后一项"""
+    found = None
+    for position, value in enumerate(values):
+        if value is None or _type_rank(value) != _type_rank(needle):
+            continue
+        result = compare(value, needle)
+        if (result <= 0) if not descending else (result >= 0):
+            found = position
+        else:
+            break
+    return found
+
+
+def _make_lookup_functions(lookups):
+    def fn_vlookup(needle, table, col_index, range_lookup=True):
+        needle = scalar(needle)
+        col_index = to_number(scalar(col_index))
+        range_lookup = to_bool(scalar(range_lookup))
+        for value in (needle, col_index, range_lookup):
+            if isinstance(value, ExcelError):
+                return value
+        if isinstance(table, ExcelError):
+            return table
+        if not isinstance(table, RangeRef):
+            return VALUE
+        col_index = int(col_index)
+        if col_index < 1:
+            return VALUE
+        if col_index > table.width:
+            return REF
+        if needle is None:
+            return NA
+        if range_lookup:
+            position = _approximate(table.column(0), needle)
+        else:
+            position = lookups.exact((table.key, 'col0'), lambda: table.column(0), needle)
+        if position is None:
+            return NA
+        result = table.value(position, col_index - 1)
+        return 0.0 if result is None else result
+
+    def fn_match(needle, lookup_range, match_type=1.0):
+        needle = scalar(needle)
+        match_type = to_number(scalar(match_type))
+        for value in (needle, match_type):
+            if isinstance(value, ExcelError):
+                return value
+        if isinstance(lookup_range, ExcelError):
+            return lookup_range
+        if not isinstance(lookup_range, RangeRef) or min(lookup_range.height, lookup_range.width) != 1:
+            return NA
+        if needle is None:
+            return NA
+        if match_type == 0:
+            position = lookups.exact((lookup_range.key, 'vec'), lookup_range.vector, needle)
+        else:
+            position = _approximate(lookup_range.vector(), needle, descending=match_type < 0)
+        return NA if position is None else float(position + 1)
+
+    return fn_vlookup, fn_match
+
+
+def fn_index(area, row_num, col_num=None):
+    row_num = to_number(scalar(row_num))
+    col_num = to_number(scalar(col_num)) if col_num is not None else None
+    for value in (row_num, col_num):
+        if isinstance(value, ExcelError):
+            return value
+    if isinstance(area, ExcelError):
+        return area
+    if not isinstance(area, RangeRef):
+        return VALUE if row_num not in (0, 1) else area
+    row_num = int(row_num)
+    if col_num is None:
+        if area.height == 1:
+            row_num, col_num = 1, row_num
+        elif area.width == 1:
+            col_num = 1
+        else:
+            return REF
+    col_num = int(col_num)
+    if row_num < 1 or col_num < 1 or row_num > area.height or col_num > area.width:
+        return REF
+    # 与Excel一样返回单元格本身的值，空单元格保持为空，由使用方决定按0还是按空处理
+    return area.value(row_num - 1, col_num - 1)
+
+
+_BUILTINS = {
+    'SUM': fn_sum,
+    'SUMIF': fn_sumif,
+    'AVERAGE': fn_average,
+    'MAX': fn_max,
+    'MIN': fn_min,
+    'ABS': fn_abs,
+    'ROUND': fn_round,
+    'INDEX': fn_index,
+    'AND': fn_and,
+    'OR': fn_or,
+    'NOT': fn_not,
+    'LEFT': fn_left,
+    'RIGHT': fn_right,
+    'LEN': fn_len,
+    'TEXT': fn_text,
+    'TODAY': fn_today,
+    'NOW': fn_now,
+    'YEAR': fn_year,
+    'MONTH': fn_month,
+    'DAY': fn_day,
+}
+
+# 参数按需求值的函数（参数以无参函数的形式传入）
+_LAZY_BUILTINS = {
+    'IF': fn_if,
+    'IFERROR': fn_iferror,
+    'IFNA': fn_ifna,
+}
+
+
+# ---------------------------------------------------------------------------
+# 工作簿模型与计算引擎
+# ---------------------------------------------------------------------------
+
+class _Sheet:
+    def __init__(self, book, title):
+        self.book = book
+        self.title = title
+        self.cells = {}     # (行, 列) -> 值；公式单元格计算后也写入这里
+        self.formulas = {}  # (行, 列) -> 公式文本（不含 '='）
+        self.max_row = 0
+        self.max_col = 0
+        self._formula_rows = None
+
+    def formula_rows(self):
+        """按列分组、行号有序的公式单元格索引，用于求区域内的依赖"""
+        if self._formula_rows is None:
+            index = {}
+            for row, col in self.formulas:
+                index.setdefault(col, []).append(row)
+            for rows in index.values():
+                rows.sort()
+            self._formula_rows = index
+        return self._formula_rows
+
+
+class _Book:
+    def __init__(self, name, path, is_template):
+        self.name = name
+        self.path = path
+        self.is_template = is_template
+        self.sheets = {}     # 工作表名（不区分大小写）-> _Sheet
+        self.links = {}      # 外部链接编号 -> 文件名
+        self.functions = {}  # 自定义函数名（大写）-> Python函数
+
+    def sheet(self, title):
+        return self.sheets.get(title.casefold())
+
+
+def _link_basename(target):
+    """外部链接目标可能是 file:///C:\\...\\x.xlsm 这样的完整路径，只取文件名"""
+    return re.split(r'[\\/]', target)[-1]
+
+
+class FormulaEngine:
+    """
+    多工作簿公式计算引擎。
+
+    用法：
+        engine = FormulaEngine(base_dir)
+        engine.load_template('积分_模板.xlsm', functions={'计算得分': score})
+        engine.calculate()
+        engine.save_values('积分_模板.xlsm', '输出.xlsx')
+
+    模板中 [n]Sheet!A:B 形式的外部引用按文件名在 base_dir 中查找；
+    若该文件本身也是已加载的模板，则直接引用其计算结果。
+    """
+
+    def __init__(self, base_dir=None, log=print):
+        self.base_dir = base_dir or os.getcwd()
+        self.log = log
+        self.books = {}
+        self._lookups = _Lookups()
+        self._functions = dict(_BUILTINS)
+        self._functions['VLOOKUP'], self._functions['MATCH'] = _make_lookup_functions(self._lookups)
+        self._compiled = None
+        self._graph = None
+        self._sources = {}
+        self._volatile = set()
+        self._dirty = set()
+        self._missing_links = set()
+
+    def load_template(self, path, functions=None):
+        """加载含公式的模板，返回用于后续引用的工作簿名"""
+        name = os.path.basename(path)
+        book = _Book(name, path, is_template=True)
+        book.functions = {key.upper(): func for key, func in (functions or {}).items()}
+
+        workbook = openpyxl.load_workbook(path, read_only=True, keep_links=True)
+        for index, link in enumerate(workbook._external_links, start=1):
+            if link.file_link is not None:
+                book.links[index] = _link_basename(link.file_link.Target)
+
+        for worksheet in workbook.worksheets:
+            sheet = _Sheet(book, worksheet.title)
+            for row_idx, row in enumerate(worksheet.iter_rows(values_only=True), start=1):
+                for col_idx, value in enumerate(row, start=1):
+                    if isinstance(value, ArrayFormula):
+                        value = value.text
+                    if value is None:
+                        continue
+                    if isinstance(value, str) and value.startswith('=') and len(value) > 1:
+                        sheet.formulas[(row_idx, col_idx)] = value[1:]
+                    else:
+                        sheet.cells[(row_idx, col_idx)] = value
+                    sheet.max_row = max(sheet.max_row, row_idx)
+                    sheet.max_col = max(sheet.max_col, col_idx)
+            book.sheets[worksheet.title.casefold()] = sheet
+        workbook.close()
+
+        self.books[name.casefold()] = book
+        self._compiled = None
+        return name
+
+    def _load_data_book(self, name):
+        """加载被引用的数据工作簿（只读、只取值）"""
+        path = os.path.join(self.base_dir, name)
+        if not os.path.exists(path):
+            if name not in self._missing_links:
+                self._missing_links.add(name)
+                self.log(f"未找到外部引用文件: {name}，相关公式将返回 #REF!")
+            return None
+
+        book = _Book(name, path, is_template=False)
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for worksheet in workbook.worksheets:
+                sheet = _Sheet(book, worksheet.title)
+                for row_idx, row in enumerate(worksheet.iter_rows(values_only=True), start=1):
+                    for col_idx, value in enumerate(row, start=1):
+                        if value is not None:
+                            sheet.cells[(row_idx, col_idx)] = value
+                            sheet.max_row = max(sheet.max_row, row_idx)
+                            sheet.max_col = max(sheet.max_col, col_idx)
+                book.sheets[worksheet.title.casefold()] = sheet
+        finally:
+            workbook.close()
+        self.books[name.casefold()] = book
+        return book
+
+    def _resolve_book(self, book, link):
+        if link is None:
+            return book
+        name = book.links.get(link)
+        if name is None:
+            return None
+        return self.books.get(name.casefold()) or self._load_data_book(name)
+
+    # ---- 编译 ----
+
+    def _compile(self, node, book, sheet):
+        kind = node[0]
+        if kind in ('num', 'str', 'bool', 'error'):
+            value = node[1]
+            return lambda: value
+        if kind == 'missing':
+            return lambda: None
+        if kind == 'ref':
+            _, link, sheet_name, min_row, min_col, max_row, max_col = node
+            target = self._ref_sheet(book, sheet, link, sheet_name)
+            if target is None:
+                return lambda: REF
+            if min_row is None:
+                min_row, max_row = 1, max(target.max_row, 1)
+            return lambda: RangeRef(target, min_row, min_col, max_row, max_col)
+        if kind == 'binop':
+            op = node[1]
+            left = self._compile(node[2], book, sheet)
+            right = self._compile(node[3], book, sheet)
+            return lambda: _binop(op, left(), right())
+        if kind == 'neg':
+            operand = self._compile(node[1], book, sheet)
+            return lambda: _arith('-', 0.0, operand())
+        if kind == 'pos':
+            operand = self._compile(node[1], book, sheet)
+            return lambda: scalar(operand())
+        if kind == 'percent':
+            operand = self._compile(node[1], book, sheet)
+            return lambda: _arith('/', operand(), 100.0)
+        if kind == 'func':
+            return self._compile_call(node[1], node[2], book, sheet)
+        raise FormulaError(f"未知的语法节点: {kind}")
+
+    def _compile_call(self, name, arg_nodes, book, sheet):
+        args = [self._compile(arg, book, sheet) for arg in arg_nodes]
+        if name in _LAZY_BUILTINS:
+            func = _LAZY_BUILTINS[name]
+            return lambda: func(*args)
+
+        if name in book.functions:
+            # 自定义函数（VBA的替代实现）只接收单个值
+            user_func = book.functions[name]
+
+            def call_user_function():
+                try:
+                    return user_func(*[scalar(arg()) for arg in args])
+                except Exception:
+                    return VALUE
+            return call_user_function
+
+        func = self._functions.get(name)
+        if func is None:
+            return lambda: NAME
+
+        def call():
+            values = [arg() for arg in args]
+            # 省略的可选参数按未提供处理
+            while values and values[-1] is None and arg_nodes[len(values) - 1] == ('missing',):
+                values.pop()
+            try:
+                return func(*values)
+            except TypeError:
+                return VALUE
+        return call
+
+    def _ref_sheet(self, book, sheet, link, sheet_name):
+        target_book = self._resolve_book(book, link)
+        if target_book is None:
+            return None
+        if sheet_name is None:
+            return sheet
+        return target_book.sheet(sheet_name)
+
+    def _build_graph(self):
+        """编译全部公式并建立依赖图：公式单元格 -> 其引用区域内的公式单元格
+
+        同时记录每个公式直接引用的外部数据文件，以及含 TODAY/NOW 的易失公式，
+        供增量计算判断哪些单元格受输入变化影响。
+        """
+        compiled = {}
+        graph = {}
+        self._sources = {}
+        self._volatile = set()
+        for book in list(self.books.values()):
+            if not book.is_template:
+                continue
+            for sheet in book.sheets.values():
+                for position, formula in sheet.formulas.items():
+                    key = (sheet, position)
+                    try:
+                        node = parse_formula(formula)
+                        compiled[key] = self._compile(node, book, sheet)
+                    except FormulaError as e:
+                        self.log(f"{book.name}!{sheet.title} {position}: {e}")
+                        compiled[key] = lambda: NAME
+                        graph[key] = set()
+                        continue
+                    graph[key] = self._dependencies(node, book, sheet)
+                    sources = {
+                        book.links[ref[1]].casefold()
+                        for ref in iter_refs(node) if ref[1] in book.links
+                    }
+                    if sources:
+                        self._sources[key] = sources
+                    if _is_volatile(node):
+                        self._volatile.add(key)
+        return compiled, graph
+
+    def _dependencies(self, node, book, sheet):
+        dependencies = set()
+        for _, link, sheet_name, min_row, min_col, max_row, max_col in iter_refs(node):
+            target = self._ref_sheet(book, sheet, link, sheet_name)
+            if target is None or not target.formulas:
+                continue
+            if min_row is None:
+                min_row, max_row = 1, max(target.max_row, 1)
+            index = target.formula_rows()
+            for col in range(min_col, max_col + 1):
+                rows = index.get(col)
+                if not rows:
+                    continue
+                for row in rows[bisect_left(rows, min_row):bisect_right(rows, max_row)]:
+                    dependencies.add((target, (row, col)))
+        return dependencies
+
+    def prepare(self):
+        """编译公式并建立依赖图（calculate 会按需自动调用）"""
+        if self._compiled is None:
+            self._compiled, self._graph = self._build_graph()
+
+    # ---- 增量计算 ----
+
+    def _dependents(self):
+        dependents = {}
+        for key, dependencies in self._graph.items():
+            for dependency in dependencies:
+                dependents.setdefault(dependency, []).append(key)
+        return dependents
+
+    @staticmethod
+    def _propagate(seeds, dependents, reached):
+        """把 seeds 及其全部下游单元格加入 reached"""
+        stack = [key for key in seeds if key not in reached]
+        reached.update(stack)
+        while stack:
+            for dependent in dependents.get(stack.pop(), ()):
+                if dependent not in reached:
+                    reached.add(dependent)
+                    stack.append(dependent)
+        return reached
+
+    @staticmethod
+    def _summarize(keys):
+        summary = {}
+        for sheet, _ in keys:
+            summary.setdefault(sheet.book.name, set()).add(sheet.title)
+        return summary
+
+    def downstream(self, changed_inputs=(), changed_templates=()):
+        """
+        标记受变化影响的公式单元格，供随后的 calculate(dirty_only=True) 使用。
+
+        :param changed_inputs: 内容发生变化的外部数据文件名
+        :param changed_templates: 需要整体重算的模板名（模板本身变化或缺少上次结果）
+        :return: {模板名: {受影响的工作表名}}
+        """
+        self.prepare()
+        changed_inputs = {name.casefold() for name in changed_inputs}
+        changed_templates = {name.casefold() for name in changed_templates}
+        dependents = self._dependents()
+
+        dirty = self._propagate(
+            (key for key in self._graph
+             if key[0].book.name.casefold() in changed_templates
+             or self._sources.get(key, set()) & changed_inputs),
+            dependents, set())
+        # 需要重新输出的模板中，易失公式（TODAY/NOW）也一并重算
+        touched_books = {sheet.book for sheet, _ in dirty}
+        self._propagate((key for key in self._volatile if key[0].book in touched_books), dependents, dirty)
+
+        self._dirty = dirty
+        return self._summarize(dirty)
+
+    def feeds(self):
+        """每个外部数据文件直接或间接影响到的工作表 {文件名: {模板名: [工作表名]}}"""
+        self.prepare()
+        dependents = self._dependents()
+        direct = {}
+        for key, sources in self._sources.items():
+            for source in sources:
+                direct.setdefault(source, []).append(key)
+        result = {}
+        for source, keys in direct.items():
+            reached = self._propagate(keys, dependents, set())
+            name = self.books[source].name if source in self.books else source
+            result[name] = {book: sorted(sheets) for book, sheets in self._summarize(reached).items()}
+        return result
+
+    def seed_values(self, name, path):
+        """从上次输出的只含数值的文件中读取公式单元格的结果，作为未受影响单元格的值"""
+        book = self.books[name.casefold()]
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for worksheet in workbook.worksheets:
+                sheet = book.sheet(worksheet.title)
+                if sheet is None or not sheet.formulas:
+                    continue
+                formulas = sheet.formulas
+                for row_idx, row in enumerate(worksheet.iter_rows(values_only=True), start=1):
+                    for col_idx, value in enumerate(row, start=1):
+                        if (row_idx, col_idx) in formulas:
+                            if isinstance(value, str) and value in ERRORS:
+                                value = ERRORS[value]
+                            sheet.cells[(row_idx, col_idx)] = value
+        finally:
+            workbook.close()
+
+    # ---- 计算 ----
+
+    def calculate(self, dirty_only=False):
+        """
+        按依赖顺序计算模板中的公式，返回实际计算的公式数量。
+
+        :param dirty_only: 为True时只计算 downstream() 标记的单元格，其余单元格沿用
+                           seed_values() 读入的上次结果
+        """
+        self.prepare()
+        compiled, graph = self._compiled, self._graph
+        self._lookups.clear()
+
+        while True:
+            try:
+                order = list(TopologicalSorter(graph).static_order())
+                break
+            except CycleError as e:
+                # 与Excel一致：循环引用中的单元格按0处理
+                cycle = e.args[1]
+                for sheet, position in cycle[:-1]:
+                    self.log(f"循环引用: {sheet.book.name}!{sheet.title} {position}，按0计算")
+                    sheet.cells[position] = 0.0
+                    compiled.pop((sheet, position), None)
+                    graph.pop((sheet, position), None)
+                cycle_keys = set(cycle)
+                for dependencies in graph.values():
+                    dependencies -= cycle_keys
+
+        dirty = self._dirty if dirty_only else None
+        count = 0
+        for key in order:
+            func = compiled.get(key)
+            if func is None or (dirty is not None and key not in dirty):
+                continue
+            sheet, position = key
+            result = scalar(func())
+            # 公式引用空单元格时Excel显示为0
+            sheet.cells[position] = 0.0 if result is None else result
+            count += 1
+        return count
+
+    def values(self, name):
+        """返回模板中全部公式单元格的计算结果 {工作表名: {(行, 列): 值}}"""
+        book = self.books[name.casefold()]
+        return {
+            sheet.title: {position: sheet.cells.get(position) for position in sheet.formulas}
+            for sheet in book.sheets.values()
+        }
+
+    def save_values(self, name, dest):
+        """以计算结果替换公式，流式另存为只含数值的 .xlsx（去掉公式、宏和外部链接）"""
+        book = self.books[name.casefold()]
+        overrides = {
+            sheet.title: {position: output_value(sheet.cells.get(position)) for position in sheet.formulas}
+            for sheet in book.sheets.values()
+        }
+        freeze_workbook(book.path, dest, overrides)
+
+
+_VOLATILE_FUNCTIONS = {'TODAY', 'NOW'}
+
+
+def _is_volatile(node):
+    if node[0] == 'func':
+        return node[1] in _VOLATILE_FUNCTIONS or any(_is_volatile(arg) for arg in node[2])
+    if node[0] == 'binop':
+        return _is_volatile(node[2]) or _is_volatile(node[3])
+    if node[0] in ('neg', 'pos', 'percent'):
+        return _is_volatile(node[1])
+    return False
+
+
+def output_value(value):
+    """把计算结果转换为可写入单元格的值"""
+    if isinstance(value, ExcelError):
+        return value.code
+    if isinstance(value, RangeRef):
+        return VALUE.code
+    return value
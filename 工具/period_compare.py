@@ -0,0 +1,181 @@
+"""
+按期间对比的科室报表
+
+把若干月份的数据整理成一个 科室 × 月份 × 指标 的数据块，报表中的每一行（单月、
+多月合计、环比/同比增减）都由对整个数据块的数组运算一次算出，再按科室切片输出。
+增加一个期间只是多算一行，不必为每个科室再循环一遍。
+
+期间用文字配置：
+    'current'     当前月
+    'mom'         上月
+    'yoy'         去年同月
+    'last<N>'     最近 N 个月，每月一行（含当前月）
+    'rolling<N>'  最近 N 个月合计（含当前月）
+    'qtd'         本季度累计
+    'ytd'         本年累计
+
+对比行：Comparison('同比增减', 'current', 'yoy', 'delta')，kind 为 'delta'（差值）
+或 'ratio'（增长率，(本期 - 基期) / 基期）；对比的两边都必须是单行的期间（'last<N>'
+只能用 'last1'）。
+"""
+import re
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+Comparison = namedtuple('Comparison', ['label', 'period', 'base', 'kind'])
+
+# 报表中“日期”列的列名
+LABEL_COLUMN = '日期'
+
+_SPEC_RE = re.compile(r'(last|rolling)(\d+)')
+
+
+def add_months(date, months):
+    """月份加减，返回该月1日"""
+    total = date.year * 12 + date.month - 1 + months
+    return datetime(total // 12, total % 12 + 1, 1)
+
+
+def resolve_period(spec, current):
+    """
+    把期间配置展开为报表行：[(日期标签, (月份, ...))]。
+
+    一行只有一个月份时直接取该月的数据，多个月份时取合计。
+    """
+    if spec == 'current':
+        months = [(current,)]
+    elif spec == 'mom':
+        months = [(add_months(current, -1),)]
+    elif spec == 'yoy':
+        months = [(add_months(current, -12),)]
+    elif spec == 'qtd':
+        months = [tuple(add_months(current, -n) for n in range((current.month - 1) % 3, -1, -1))]
+    elif spec == 'ytd':
+        months = [tuple(add_months(current, -n) for n in range(current.month - 1, -1, -1))]
+    else:
+        match = _SPEC_RE.fullmatch(str(spec))
+        if not match or int(match.group(2)) < 1:
+            raise ValueError(f"无法识别的期间: {spec}")
+        count = int(match.group(2))
+        if match.group(1) == 'last':
+            months = [(add_months(current, -n),) for n in range(count)]
+        else:
+            months = [tuple(add_months(current, -n) for n in range(count - 1, -1, -1))]
+
+    rows = []
+    for window in months:
+        if len(window) == 1 and spec not in ('qtd', 'ytd'):
+            label = window[0].strftime('%Y.%m')
+        else:
+            label = f"{window[0].strftime('%Y.%m')}-{window[-1].strftime('%Y.%m')}合计"
+        rows.append((label, window))
+    return rows
+
+
+def build_cube(months, metrics):
+    """
+    把各月份的数据整理成一个数据块：行索引为 (科室, 月份)，列为指标。
+
+    :param months: 月份 -> {科室: {指标: 数值}}
+    :param metrics: 指标（列）顺序
+    :return: object 类型的 DataFrame，数值保持原样；某月没有数据的科室不出现在索引中
+    """
+    keys = []
+    records = []
+    for date, departments in months.items():
+        for department, values in departments.items():
+            keys.append((department, date))
+            records.append(values)
+    index = pd.MultiIndex.from_tuples(keys, names=['科室', '月份']) if keys \
+        else pd.MultiIndex.from_arrays([[], []], names=['科室', '月份'])
+    return pd.DataFrame.from_records(records, index=index, columns=list(metrics)).astype(object)
+
+
+class PeriodComparison:
+    """
+    用法：
+        engine = PeriodComparison(['current', 'mom', 'yoy'],
+                                  [Comparison('同比增减', 'current', 'yoy', 'delta')])
+        sheets = engine.build(loader.month, current_date, FIELDS)
+        for department, frame in sheets.items(): ...
+    """
+
+    def __init__(self, periods, comparisons=()):
+        """
+        :param periods: 期间配置，按报表中的行顺序
+        :param comparisons: Comparison 序列，排在期间行之后
+        """
+        self.periods = list(periods)
+        self.comparisons = list(comparisons)
+        for comparison in self.comparisons:
+            if comparison.kind not in ('delta', 'ratio'):
+                raise ValueError(f"无法识别的对比方式: {comparison.kind}")
+            # 对比的两边各只能是一行
+            for spec in (comparison.period, comparison.base):
+                match = _SPEC_RE.fullmatch(str(spec))
+                if match and match.group(1) == 'last' and int(match.group(2)) > 1:
+                    raise ValueError(f"期间 {spec} 有多行，不能用于对比: {comparison.label}")
+
+    def months_needed(self, current):
+        """生成报表需要载入的全部月份"""
+        needed = []
+        for spec in self.periods + [c.period for c in self.comparisons] + [c.base for c in self.comparisons]:
+            for _, window in resolve_period(spec, current):
+                needed.extend(window)
+        return list(dict.fromkeys(needed))
+
+    def build(self, load_month, current, metrics):
+        """
+        生成全部科室的报表。
+
+        :param load_month: 月份 -> {科室: {指标: 数值}} 的函数，每个月份只调用一次
+        :param current: 当前月份
+        :param metrics: 指标（列）顺序
+        :return: {科室: DataFrame}，列为 日期 + 指标；科室的顺序与数据块中第一次出现的顺序一致
+        """
+        metrics = list(metrics)
+        cube = build_cube({date: load_month(date) for date in self.months_needed(current)}, metrics)
+        if cube.empty:
+            return {}
+        numeric = cube.apply(pd.to_numeric, errors='coerce').astype(float)
+        by_month = cube.index.get_level_values('月份')
+
+        def window_values(window, frame):
+            # 单月：取该月的值；多月：按科室合计数值（全部为空时仍为空）
+            if len(window) == 1:
+                return frame[by_month == window[0]].droplevel('月份')
+            part = numeric[by_month.isin(window)]
+            return part.groupby(level='科室', sort=False).sum(min_count=1)
+
+        blocks = []
+        spec_rows = {}
+        for spec in self.periods:
+            for label, window in resolve_period(spec, current):
+                blocks.append((label, window_values(window, cube)))
+        for comparison in self.comparisons:
+            for spec in (comparison.period, comparison.base):
+                if spec not in spec_rows:
+                    (_, window), = resolve_period(spec, current)
+                    spec_rows[spec] = window_values(window, numeric)
+            period, base = spec_rows[comparison.period], spec_rows[comparison.base]
+            period, base = period.align(base, join='inner')
+            if comparison.kind == 'delta':
+                values = period - base
+            else:
+                values = (period - base) / base.replace(0, np.nan)
+            blocks.append((comparison.label, values))
+
+        frames = []
+        for label, values in blocks:
+            frame = values.reindex(columns=metrics)
+            frame.insert(0, LABEL_COLUMN, label)
+            frames.append(frame.astype(object))
+        if not frames:
+            return {}
+        # 各行在合并后的表中保持配置的顺序，分组时按科室取出
+        table = pd.concat(frames)
+        return {department: rows.reset_index(drop=True)
+                for department, rows in table.groupby(level=0, sort=False)}
@@ -0,0 +1,100 @@
+"""
+启动耗时分析
+
+命令行带 --profile-startup 时，从导入本模块开始记录之后每个模块的首次导入耗时
+（自身耗时和含子模块的累计耗时），以及用 phase() 标出的各阶段耗时；程序结束时
+输出报告，并与启动预算比较。未带该参数时 phase() 为空操作，几乎没有开销。
+
+用法（放在脚本最前面，其余导入之前）：
+    from startup_profiler import profiler
+    ...
+    with profiler.phase('释放模板'):
+        extract_resources()
+    profiler.mark_ready()   # 用户可以开始操作的时刻
+"""
+import atexit
+import builtins
+import sys
+import time
+from contextlib import contextmanager
+
+FLAG = '--profile-startup'
+
+# 冷启动（导入开始到 mark_ready）的默认预算，单位秒
+DEFAULT_BUDGET = 1.0
+
+
+class StartupProfiler:
+    def __init__(self, enabled, budget=DEFAULT_BUDGET, log=print):
+        self.enabled = enabled
+        self.budget = budget
+        self.log = log
+        self.start = time.perf_counter()
+        self.ready_at = None
+        self.imports = []  # (模块名, 自身耗时, 累计耗时, 嵌套深度)
+        self.phases = []   # (阶段名, 耗时)
+        self._stack = []   # 正在导入的模块的子模块耗时累计
+        self._original_import = None
+        if enabled:
+            self._install()
+            atexit.register(self.report)
+
+    def _install(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # 只统计绝对导入中尚未加载的模块，已加载的模块直接返回
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        self._stack.append(0.0)
+        begin = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - begin
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.imports.append((name, elapsed - children, elapsed, len(self._stack)))
+
+    @contextmanager
+    def phase(self, name):
+        """标记一个启动阶段"""
+        if not self.enabled:
+            yield
+            return
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - begin))
+
+    def mark_ready(self):
+        """记录程序准备就绪（开始处理或等待用户操作）的时刻"""
+        if self.ready_at is None:
+            self.ready_at = time.perf_counter()
+
+    def report(self, top=15):
+        if not self.enabled:
+            return
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+        total = time.perf_counter() - self.start
+        self.log('\n===== 启动耗时分析 =====')
+        self.log(f'{"模块":<40}{"自身(ms)":>10}{"累计(ms)":>10}')
+        for name, own, cumulative, depth in sorted(self.imports, key=lambda item: -item[2])[:top]:
+            self.log(f'{name:<40}{own * 1000:>10.1f}{cumulative * 1000:>10.1f}')
+        import_total = sum(cumulative for _, _, cumulative, depth in self.imports if depth == 0)
+        self.log(f'顶层导入合计: {import_total * 1000:.1f} ms')
+        for name, elapsed in self.phases:
+            self.log(f'阶段 {name}: {elapsed * 1000:.1f} ms')
+        if self.ready_at is not None:
+            cold_start = self.ready_at - self.start
+            status = '超出预算' if cold_start > self.budget else '在预算内'
+            self.log(f'冷启动: {cold_start * 1000:.1f} ms（预算 {self.budget * 1000:.0f} ms，{status}）')
+        self.log(f'总运行时间: {total * 1000:.1f} ms')
+
+
+profiler = StartupProfiler(FLAG in sys.argv)
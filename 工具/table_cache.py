@@ -0,0 +1,178 @@
+"""
+每月输入表格的列式旁路缓存
+
+第一次读取某个 Excel 文件时照常用 pandas 解析，再把得到的 DataFrame 保存在当前
+用户自己的缓存目录中（Windows 为 %LOCALAPPDATA% 下的“表格缓存”，其他系统为
+~/.cache/表格缓存；安装了 pyarrow 时为 Parquet，否则为 pickle）。缓存不放在源文件
+旁边：输入文件常在下载目录或共享盘上，别人放进去的 pickle 文件载入时可以执行任意代码。
+之后任何脚本用同样的参数读取同一文件，只要文件的大小、修改时间未变，或者内容
+哈希与缓存记录一致，就直接载入缓存，不再解析 xlsx 的XML。
+
+缓存按“源文件 + 读取参数”区分，不同的 header/sheet_name/skiprows 各存一份。
+pandas 在第一次读取时才导入，不拖慢调用方的启动。
+"""
+import hashlib
+import json
+import os
+
+CACHE_DIR_NAME = '表格缓存'
+
+
+def _default_cache_dir():
+    base = os.environ.get('LOCALAPPDATA') if os.name == 'nt' else None
+    if not base:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, CACHE_DIR_NAME)
+
+
+# 缓存目录，只属于当前用户
+CACHE_DIR = _default_cache_dir()
+
+# 同一进程内重复读取时直接返回，不再访问磁盘：(路径, 参数) -> (大小, 修改时间, DataFrame)
+_memory = {}
+
+
+def file_hash(path):
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _options_key(options):
+    """把读取参数规范成稳定的字符串，作为缓存文件名的一部分"""
+    normalized = {}
+    for name, value in sorted(options.items()):
+        if isinstance(value, (range, tuple, set)):
+            value = list(value)
+        normalized[name] = value
+    return json.dumps(normalized, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _source_prefix(path):
+    """缓存文件名前缀：源文件名 + 完整路径的摘要，不同目录中的同名文件互不影响"""
+    path = os.path.abspath(path)
+    digest = hashlib.sha1(os.path.normcase(path).encode('utf-8')).hexdigest()[:12]
+    return f"{os.path.basename(path)}.{digest}."
+
+
+def _cache_paths(path, options_key):
+    digest = hashlib.sha1(options_key.encode('utf-8')).hexdigest()[:12]
+    stem = os.path.join(CACHE_DIR, _source_prefix(path) + digest)
+    return CACHE_DIR, stem + '.json', stem
+
+
+def _load_cached(stem, fmt):
+    import pandas as pd
+    if fmt == 'parquet':
+        return pd.read_parquet(stem + '.parquet')
+    return pd.read_pickle(stem + '.pkl')
+
+
+def _store(stem, df):
+    """优先保存为Parquet；列中混有不同类型等Parquet无法表示的情况改用pickle"""
+    if _parquet_available():
+        try:
+            df.to_parquet(stem + '.parquet', index=True)
+            return 'parquet'
+        except Exception:
+            if os.path.exists(stem + '.parquet'):
+                os.remove(stem + '.parquet')
+    df.to_pickle(stem + '.pkl')
+    return 'pickle'
+
+
+def _write_meta(meta_path, meta):
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def read_excel_cached(path, log=None, **options):
+    """
+    与 pd.read_excel(path, **options) 结果相同，但解析结果会缓存下来。
+
+    :param path: Excel 文件路径
+    :param log: 可选的日志函数，命中或写入缓存时输出一行说明
+    :param options: 传给 pd.read_excel 的参数（sheet_name、header、skiprows 等）
+    :return: DataFrame；返回的是副本，调用方可以随意修改
+    """
+    stat = os.stat(path)
+    options_key = _options_key(options)
+    memory_key = (os.path.abspath(path), options_key)
+
+    remembered = _memory.get(memory_key)
+    if remembered and remembered[:2] == (stat.st_size, stat.st_mtime_ns):
+        return remembered[2].copy()
+
+    directory, meta_path, stem = _cache_paths(path, options_key)
+    meta = None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        pass
+
+    import pandas as pd
+
+    df = None
+    if meta and meta.get('options') == options_key:
+        fresh = meta.get('size') == stat.st_size and meta.get('mtime_ns') == stat.st_mtime_ns
+        content_hash = None
+        if not fresh and meta.get('size') == stat.st_size:
+            # 修改时间变了（复制、重新下载），内容可能没变
+            content_hash = file_hash(path)
+            fresh = content_hash == meta.get('sha256')
+        if fresh:
+            try:
+                df = _load_cached(stem, meta.get('format'))
+            except Exception:
+                df = None
+            if df is not None and content_hash:
+                meta['mtime_ns'] = stat.st_mtime_ns
+                _write_meta(meta_path, meta)
+            if df is not None and log:
+                log(f"使用缓存: {os.path.basename(path)}")
+
+    if df is None:
+        df = pd.read_excel(path, **options)
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            fmt = _store(stem, df)
+            _write_meta(meta_path, {
+                'source': os.path.basename(path),
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha256': file_hash(path),
+                'options': options_key,
+                'format': fmt,
+            })
+            if log:
+                log(f"已缓存: {os.path.basename(path)}")
+        except OSError as e:
+            # 缓存只是加速手段，写不进去（只读目录等）不影响结果
+            if log:
+                log(f"写入缓存失败 {os.path.basename(path)}: {str(e)}")
+
+    _memory[memory_key] = (stat.st_size, stat.st_mtime_ns, df)
+    return df.copy()
+
+
+def clear_cache(path):
+    """删除某个源文件的全部缓存"""
+    prefix = _source_prefix(path)
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.startswith(prefix):
+                os.remove(os.path.join(CACHE_DIR, name))
+    for key in [key for key in _memory if key[0] == os.path.abspath(path)]:
+        del _memory[key]
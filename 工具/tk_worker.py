@@ -0,0 +1,160 @@
+"""
+tkinter 界面的后台任务执行
+
+耗时的处理放在后台线程中运行，界面线程只负责显示。后台线程的日志、进度和需要在
+界面线程执行的操作（弹窗等）都放入队列，由 Tk 主循环按固定间隔批量取出：一批日志
+只插入一次文本框，进度只按最新值刷新一次，处理速度不再受界面重绘拖累。
+
+用法：
+    self.runner = TaskRunner(self.root, self.append_log, busy_widgets=[self.button])
+    self.runner.frame.pack(fill=tk.X)         # 进度条和“取消”按钮
+    self.runner.start(self.process, path)     # process 在后台线程中运行
+
+process 中调用 runner.log()、runner.set_progress()，并在循环中调用
+runner.check_cancelled()；用户点击“取消”后该调用抛出 TaskCancelled。
+"""
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+# 队列检查间隔（毫秒）
+POLL_INTERVAL = 100
+
+
+class TaskCancelled(Exception):
+    """用户取消了正在执行的任务"""
+
+
+class TaskRunner:
+    def __init__(self, root, log_sink, busy_widgets=(), parent=None, interval=POLL_INTERVAL):
+        """
+        :param root: Tk 根窗口
+        :param log_sink: 在界面线程中接收一批日志文字（已用换行连接）的函数
+        :param busy_widgets: 任务执行期间禁用的控件（例如文件选择按钮）
+        :param parent: 进度条所在的父控件，默认为 root
+        :param interval: 队列检查间隔（毫秒）
+        """
+        self.root = root
+        self.log_sink = log_sink
+        self.busy_widgets = list(busy_widgets)
+        self.interval = interval
+        self._queue = queue.Queue()
+        self._cancel = threading.Event()
+        self._thread = None
+
+        self.frame = tk.Frame(parent or root)
+        self.progress_var = tk.DoubleVar(value=0)
+        self.progress_bar = ttk.Progressbar(self.frame, variable=self.progress_var, maximum=1.0)
+        self.progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
+        self.status_label = tk.Label(self.frame, text="", width=12)
+        self.status_label.pack(side=tk.LEFT)
+        self.cancel_button = tk.Button(self.frame, text="取消", command=self.cancel, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT)
+
+        self.root.after(self.interval, self._drain)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # ---------- 以下方法可在任意线程中调用 ----------
+
+    def log(self, message):
+        self._queue.put(('log', str(message)))
+
+    def set_progress(self, done, total):
+        self._queue.put(('progress', (done, total)))
+
+    def call_in_ui(self, func, *args):
+        """在界面线程中执行 func(*args)，例如 messagebox"""
+        self._queue.put(('call', (func, args)))
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise TaskCancelled()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    # ---------- 以下方法只在界面线程中调用 ----------
+
+    def start(self, func, *args):
+        """在后台线程中执行 func(*args)；已有任务在执行时忽略"""
+        if self.running:
+            return False
+        self._cancel.clear()
+        self._set_busy(True)
+        self.progress_var.set(0)
+        self.status_label.config(text="处理中...")
+        self._thread = threading.Thread(target=self._run, args=(func, args), daemon=True)
+        self._thread.start()
+        return True
+
+    def cancel(self):
+        if self.running:
+            self._cancel.set()
+            self.status_label.config(text="正在取消...")
+
+    def _run(self, func, args):
+        try:
+            func(*args)
+        except TaskCancelled:
+            self.log("任务已取消")
+        except Exception as e:
+            self.log(f"发生错误: {str(e)}")
+        finally:
+            self._queue.put(('finished', None))
+
+    def _set_busy(self, busy):
+        for widget in self.busy_widgets:
+            widget.config(state=tk.DISABLED if busy else tk.NORMAL)
+        self.cancel_button.config(state=tk.NORMAL if busy else tk.DISABLED)
+
+    def _drain(self):
+        # 无论本次处理是否出错都要继续轮询，否则界面会一直停在“处理中”
+        try:
+            self._drain_queue()
+        finally:
+            self.root.after(self.interval, self._drain)
+
+    def _drain_queue(self):
+        lines = []
+        progress = None
+        try:
+            while True:
+                kind, payload = self._queue.get_nowait()
+                if kind == 'log':
+                    lines.append(payload)
+                    continue
+                if kind == 'progress':
+                    progress = payload
+                    continue
+                # 弹窗等操作之前先输出已积累的日志，保持先后顺序
+                if lines:
+                    self.log_sink('\n'.join(lines))
+                    lines = []
+                if kind == 'call':
+                    func, args = payload
+                    try:
+                        func(*args)
+                    except Exception as e:
+                        # 例如窗口已关闭后再弹窗；记录后继续处理队列
+                        lines.append(f"界面操作出错: {str(e)}")
+                elif kind == 'finished':
+                    if progress is not None:
+                        self._show_progress(*progress)
+                        progress = None
+                    self._set_busy(False)
+                    self.status_label.config(text="已取消" if self.cancelled else "完成")
+        except queue.Empty:
+            pass
+        if lines:
+            self.log_sink('\n'.join(lines))
+        if progress is not None:
+            self._show_progress(*progress)
+
+    def _show_progress(self, done, total):
+        self.progress_var.set(done / total if total else 0)
+        self.status_label.config(text=f"{done}/{total}")
@@ -0,0 +1,228 @@
+"""
+按表头特征识别输入工作簿的类型
+
+只用 openpyxl 只读模式打开工作簿，每张工作表最多读取前几行，与已知输入类型的
+特征（工作表名、表头单元格、标题关键字、最少列数/行数）比对，不依赖文件名。
+识别结果写入索引文件（类型、月份、工作表、表头行、行数），后续步骤直接读取索引，
+文件未变化时不再重新探测。
+
+行数和列数取自工作表XML开头的 <dimension>，不需要读完整张表。
+"""
+import json
+import os
+import re
+import zipfile
+
+PROBE_ROWS = 10
+INDEX_FILE = "输入文件索引.json"
+
+STATUS_OK = "正常"
+STATUS_INCOMPLETE = "疑似不完整"
+STATUS_MISLABELLED = "文件名与内容不符"
+STATUS_UNKNOWN = "未识别"
+STATUS_BROKEN = "无法打开"
+
+_MONTH_PATTERNS = [
+    re.compile(r'(\d{4})年(\d{1,2})月'),
+    re.compile(r'(\d{4})[.\-_/](\d{1,2})(?!\d)'),
+    re.compile(r'(?<!\d)(\d{4})(\d{2})'),
+]
+
+
+class InputType:
+    """一种已知输入工作簿的特征"""
+
+    def __init__(self, name, keywords=(), headers=(), sheets=(), sheet=None, min_cols=0, min_rows=0):
+        """
+        :param name: 类型名，也是整理后的标准文件名（不含扩展名）
+        :param keywords: 标题关键字，出现在文件名、工作表名或前几行任一单元格中即算命中
+        :param headers: 表头单元格，必须全部出现在同一行（整格相等）
+        :param sheets: 必须存在的工作表名
+        :param sheet: 数据所在的工作表，默认第一张
+        :param min_cols: 数据表至少应有的列数（模板引用到的最右一列）
+        :param min_rows: 数据表至少应有的行数
+        """
+        self.name = name
+        self.keywords = tuple(keywords)
+        self.headers = tuple(headers)
+        self.sheets = tuple(sheets)
+        self.sheet = sheet
+        self.min_cols = min_cols
+        self.min_rows = min_rows
+
+
+class WorkbookProbe:
+    """工作簿的探测结果：工作表名、各表前几行内容和尺寸"""
+
+    def __init__(self, path):
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.sheetnames = []
+        self.rows = {}   # 工作表名 -> 前几行的值
+        self.sizes = {}  # 工作表名 -> (行数, 列数)，无 <dimension> 时为 None
+        self._content = None
+
+    def content(self):
+        """工作表名和前几行单元格的全部文字，用于关键字匹配"""
+        if self._content is None:
+            parts = list(self.sheetnames)
+            for rows in self.rows.values():
+                for row in rows:
+                    parts.extend(str(value) for value in row if value is not None)
+            self._content = '\n'.join(parts)
+        return self._content
+
+
+def probe_workbook(path, probe_rows=PROBE_ROWS):
+    """只读打开工作簿，读取每张工作表的前 probe_rows 行"""
+    from openpyxl import load_workbook
+
+    probe = WorkbookProbe(path)
+    wb = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        probe.sheetnames = list(wb.sheetnames)
+        for ws in wb.worksheets:
+            probe.rows[ws.title] = [
+                list(row) for row in ws.iter_rows(max_row=probe_rows, values_only=True)
+            ]
+            max_row, max_col = ws.max_row, ws.max_column
+            probe.sizes[ws.title] = (max_row, max_col) if max_row and max_col else None
+    finally:
+        wb.close()
+    return probe
+
+
+def extract_month(*texts):
+    """从文件名或表格文字中提取 'YYYY-MM'，找不到时返回 None"""
+    for text in texts:
+        for pattern in _MONTH_PATTERNS:
+            for year, month in pattern.findall(text or ''):
+                if 1 <= int(month) <= 12:
+                    return f"{year}-{int(month):02d}"
+    return None
+
+
+def _header_row(rows, headers):
+    """返回同时包含全部表头单元格的行号（从1开始），没有时返回 None"""
+    wanted = set(headers)
+    for row_idx, row in enumerate(rows, start=1):
+        cells = {str(value).strip() for value in row if value is not None}
+        if wanted <= cells:
+            return row_idx
+    return None
+
+
+def _guess_header_row(rows):
+    """没有表头特征时，取前几行中第一个非空单元格数达到最多的行"""
+    counts = [sum(value is not None for value in row) for row in rows]
+    if not counts or not max(counts):
+        return None
+    return counts.index(max(counts)) + 1
+
+
+def _score(spec, probe):
+    """返回 (得分, 工作表, 表头行)；不满足硬性条件时返回 None"""
+    if any(sheet not in probe.sheetnames for sheet in spec.sheets):
+        return None
+    sheet = spec.sheet or (probe.sheetnames[0] if probe.sheetnames else None)
+    if sheet not in probe.rows:
+        return None
+    rows = probe.rows[sheet]
+
+    score = len(spec.sheets) * 3
+    header_row = None
+    if spec.headers:
+        header_row = _header_row(rows, spec.headers)
+        if header_row is None:
+            return None
+        score += len(spec.headers) * 10
+    for keyword in spec.keywords:
+        if keyword in probe.content():
+            score += 5
+        elif keyword in probe.filename:
+            score += 1
+    if not score:
+        return None
+    return score, sheet, header_row or _guess_header_row(rows)
+
+
+def classify(path, registry, probe_rows=PROBE_ROWS):
+    """
+    识别一个工作簿。
+
+    :return: 索引条目字典：type、month、sheet、header_row、rows、cols、status
+    """
+    entry = {'type': None, 'month': extract_month(os.path.basename(path)), 'sheet': None,
+             'header_row': None, 'rows': None, 'cols': None, 'status': STATUS_UNKNOWN}
+    try:
+        probe = probe_workbook(path, probe_rows)
+    except (zipfile.BadZipFile, KeyError, OSError, ValueError) as e:
+        # 下载中断的文件通常连ZIP目录都不完整
+        entry['status'] = STATUS_BROKEN
+        entry['error'] = str(e)
+        return entry
+
+    best = None
+    for spec in registry:
+        result = _score(spec, probe)
+        if result and (best is None or result[0] > best[1][0]):
+            best = (spec, result)
+    if best is None:
+        return entry
+
+    spec, (_, sheet, header_row) = best
+    size = probe.sizes.get(sheet)
+    entry.update(type=spec.name, sheet=sheet, header_row=header_row,
+                 rows=size[0] if size else None, cols=size[1] if size else None,
+                 status=STATUS_OK)
+    if entry['month'] is None:
+        entry['month'] = extract_month(probe.content())
+
+    if size and (size[1] < spec.min_cols or size[0] < spec.min_rows):
+        entry['status'] = STATUS_INCOMPLETE
+    else:
+        # 文件名明确写着另一种类型时提示可能下错了文件
+        claimed = [other.name for other in registry
+                   if other is not spec and other.name in probe.filename]
+        if claimed and spec.name not in probe.filename:
+            entry['status'] = STATUS_MISLABELLED
+            entry['claimed'] = claimed[0]
+    return entry
+
+
+def load_index(directory='.'):
+    try:
+        with open(os.path.join(directory, INDEX_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_index(index, directory='.'):
+    with open(os.path.join(directory, INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+
+
+def classify_directory(registry, directory='.', index=None, log=print):
+    """
+    识别目录下全部 .xlsx 文件，返回 {文件名: 条目}。
+
+    index 中记录的大小和修改时间与文件一致时直接沿用，不再打开工作簿。
+    """
+    index = load_index(directory) if index is None else index
+    results = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.xlsx') or filename.startswith('~$'):
+            continue
+        path = os.path.join(directory, filename)
+        stat = os.stat(path)
+        cached = index.get(filename)
+        if cached and cached.get('size') == stat.st_size and cached.get('mtime_ns') == stat.st_mtime_ns:
+            results[filename] = cached
+            continue
+        entry = classify(path, registry)
+        entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        if entry['status'] != STATUS_OK:
+            log(f"{filename}: {entry['status']}" + (f"（识别为{entry['type']}）" if entry['type'] else ''))
+        results[filename] = entry
+    return results
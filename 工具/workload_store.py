@@ -0,0 +1,148 @@
+"""
+工作量历史数据库
+
+医生、护理工作量按 (来源, 科室, 期间, 指标) 保存在本地 SQLite 文件中。每月运行时
+只需把新月份写入数据库，同一月份重复导入会整月替换原有数据（幂等）；各科室的历史
+明细由按科室建立索引的查询直接取出，不必再读回之前生成的 Excel 文件。
+
+年月形式的期间统一保存为 'YYYY.MM'（如 '2025.01'），按文字排序即为时间顺序；写入时
+'2025.1'、'2025-01'、'2025年1月' 等写法会先换成这种格式。不是单个年月的期间
+（如 '2024年1-3月'）按原文字保存。
+"""
+import math
+import numbers
+import os
+import re
+import sqlite3
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '工作量历史.db')
+
+SOURCE_DOCTOR = '医生'
+SOURCE_NURSING = '护理'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS workload (
+    source     TEXT NOT NULL,
+    department TEXT NOT NULL,
+    period     TEXT NOT NULL,
+    metric     TEXT NOT NULL,
+    value,
+    PRIMARY KEY (source, department, period, metric)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS workload_period ON workload (source, period);
+"""
+
+_PERIOD_RE = re.compile(r'(\d{4})\s*[.\-/年]\s*(\d{1,2})\s*月?')
+
+
+def normalize_period(period):
+    """年月形式的期间换成 'YYYY.MM'，其他期间返回去掉首尾空白的原文字"""
+    text = str(period).strip()
+    match = _PERIOD_RE.fullmatch(text)
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        return text
+    return f"{match.group(1)}.{int(match.group(2)):02d}"
+
+
+def _plain(value):
+    """把 numpy/pandas 数值转换为 SQLite 可保存的类型；空值和 NaN 返回 None"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        return value if math.isfinite(value) else None
+    return str(value)
+
+
+class WorkloadStore:
+    """
+    用法：
+        with WorkloadStore() as store:
+            store.replace_period(SOURCE_DOCTOR, '2025.01', [(科室, 指标, 数值), ...])
+            history = store.department_history(SOURCE_DOCTOR, '内科')
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def upsert(self, source, period, facts):
+        """
+        写入一个期间的部分数据，已有的 (科室, 指标) 直接覆盖，其余数据保留。
+
+        :param period: 期间，年月形式的保存为 'YYYY.MM'
+        :param facts: (科室, 指标, 数值) 序列；数值为空的项不保存
+        :return: 写入的条数
+        """
+        return self._write(source, period, facts, replace=False)
+
+    def replace_period(self, source, period, facts):
+        """
+        整月写入：先删除该期间原有的全部数据，再写入 facts（同一事务中完成）。
+        重新导入修正后的月份时，已不存在的科室或指标不会残留在数据库中。
+
+        参数与返回值同 upsert
+        """
+        return self._write(source, period, facts, replace=True)
+
+    def _write(self, source, period, facts, replace):
+        period = normalize_period(period)
+        rows = []
+        for department, metric, value in facts:
+            value = _plain(value)
+            if value is not None:
+                rows.append((source, str(department), period, metric, value))
+        with self.connection:
+            if replace:
+                self.connection.execute(
+                    "DELETE FROM workload WHERE source = ? AND period = ?", (source, period))
+            self.connection.executemany(
+                "INSERT INTO workload (source, department, period, metric, value) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (source, department, period, metric) DO UPDATE SET value = excluded.value",
+                rows)
+        return len(rows)
+
+    def periods(self, source):
+        """已保存的全部期间，按时间顺序"""
+        cursor = self.connection.execute(
+            "SELECT DISTINCT period FROM workload WHERE source = ? ORDER BY period", (source,))
+        return [period for period, in cursor]
+
+    def has_period(self, source, period):
+        cursor = self.connection.execute(
+            "SELECT 1 FROM workload WHERE source = ? AND period = ? LIMIT 1", (source, normalize_period(period)))
+        return cursor.fetchone() is not None
+
+    def department_history(self, source, department):
+        """一个科室的全部历史：{期间: {指标: 数值}}，按时间顺序"""
+        history = {}
+        cursor = self.connection.execute(
+            "SELECT period, metric, value FROM workload WHERE source = ? AND department = ? ORDER BY period",
+            (source, str(department)))
+        for period, metric, value in cursor:
+            history.setdefault(period, {})[metric] = value
+        return history
+
+    def period_values(self, source, period):
+        """一个期间全部科室的数据：{科室: {指标: 数值}}"""
+        values = {}
+        cursor = self.connection.execute(
+            "SELECT department, metric, value FROM workload WHERE source = ? AND period = ?",
+            (source, normalize_period(period)))
+        for department, metric, value in cursor:
+            values.setdefault(department, {})[metric] = value
+        return values
@@ -0,0 +1,167 @@
+"""
+流式“冻结”工作簿：把 .xlsm/.xlsx 中各工作表的缓存值逐行写成只含数值的 .xlsx
+
+输入用 openpyxl 只读模式逐行读取，输出用只写模式逐行写出，内存占用与工作表
+大小无关。公式、宏和外部链接都会被丢弃，单元格样式、工作簿默认字体、列宽、
+行高和合并单元格保留。只读模式下 openpyxl 不提供列宽、行高和合并区域，这几部分
+直接从工作表XML中读取。
+"""
+import posixpath
+import zipfile
+from copy import copy
+from xml.etree.ElementTree import iterparse
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.indexed_list import IndexedList
+from openpyxl.worksheet.dimensions import ColumnDimension, RowDimension
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+class SheetLayout:
+    """工作表的列宽定义、行高和合并单元格区域"""
+
+    def __init__(self):
+        self.columns = []  # (起始列, 结束列, 宽度, 是否隐藏)
+        self.rows = []     # (行号, 行高, 是否隐藏)，只记录设置了行高或隐藏的行
+        self.merged = []   # 'A1:B2' 形式的区域
+
+
+def sheet_paths(archive):
+    """从 workbook.xml 及其关系文件中解析 {工作表名: 包内XML路径}"""
+    with archive.open('xl/_rels/workbook.xml.rels') as f:
+        targets = {}
+        for _, elem in iterparse(f):
+            if elem.tag == f'{PKG_REL_NS}Relationship':
+                target = elem.get('Target')
+                if target.startswith('/'):
+                    target = target[1:]
+                else:
+                    target = posixpath.normpath(posixpath.join('xl', target))
+                targets[elem.get('Id')] = target
+
+    paths = {}
+    with archive.open('xl/workbook.xml') as f:
+        for _, elem in iterparse(f):
+            if elem.tag == f'{MAIN_NS}sheet':
+                target = targets.get(elem.get(f'{REL_NS}id'))
+                if target:
+                    paths[elem.get('name')] = target
+    return paths
+
+
+def read_sheet_layout(archive, path):
+    """流式读取一张工作表的 <cols>、各行的行高与 <mergeCells>，读过的行随即释放"""
+    layout = SheetLayout()
+    with archive.open(path) as f:
+        for _, elem in iterparse(f):
+            tag = elem.tag
+            if tag == f'{MAIN_NS}row':
+                height = elem.get('ht')
+                hidden = elem.get('hidden') in ('1', 'true')
+                if (height is not None or hidden) and elem.get('r'):
+                    layout.rows.append((int(elem.get('r')), float(height) if height is not None else None, hidden))
+                elem.clear()
+            elif tag == f'{MAIN_NS}col':
+                width = elem.get('width')
+                layout.columns.append((
+                    int(elem.get('min')),
+                    int(elem.get('max')),
+                    float(width) if width is not None else None,
+                    elem.get('hidden') in ('1', 'true'),
+                ))
+            elif tag == f'{MAIN_NS}mergeCell':
+                layout.merged.append(elem.get('ref'))
+    return layout
+
+
+def read_layouts(path):
+    """读取工作簿中全部工作表的布局 {工作表名: SheetLayout}"""
+    with zipfile.ZipFile(path) as archive:
+        return {name: read_sheet_layout(archive, sheet_path)
+                for name, sheet_path in sheet_paths(archive).items()}
+
+
+class _StyleCopier:
+    """把只读工作簿中的单元格样式复制到只写工作簿，每种样式只转换一次"""
+
+    def __init__(self):
+        self._styles = {}
+
+    def apply(self, source, target):
+        style_id = getattr(source, '_style_id', 0)
+        if not style_id:
+            return
+        style = self._styles.get(style_id)
+        if style is None:
+            target.font = copy(source.font)
+            target.fill = copy(source.fill)
+            target.border = copy(source.border)
+            target.alignment = copy(source.alignment)
+            target.protection = copy(source.protection)
+            target.number_format = source.number_format
+            self._styles[style_id] = copy(target._style)
+        else:
+            target._style = copy(style)
+
+
+def freeze_workbook(src_path, dest, overrides=None, keep_styles=True):
+    """
+    把工作簿的缓存值流式写成只含数值的 .xlsx。
+
+    :param src_path: 源文件（.xlsm 或 .xlsx）
+    :param dest: 输出路径或可写的二进制文件对象
+    :param overrides: 可选 {工作表名: {(行, 列): 值}}，替换对应单元格的缓存值
+                      （例如公式引擎的计算结果）
+    :param keep_styles: 是否复制单元格样式
+    :return: 写出的单元格数量
+    """
+    overrides = overrides or {}
+    layouts = read_layouts(src_path)
+    source = load_workbook(src_path, read_only=True, data_only=True, keep_links=False)
+    target = Workbook(write_only=True)
+    # 默认样式的单元格使用工作簿默认字体（字体列表中的第一个），沿用源文件的
+    if source._fonts:
+        target._fonts = IndexedList([copy(source._fonts[0])])
+    copier = _StyleCopier()
+    cell_count = 0
+
+    try:
+        for worksheet in source.worksheets:
+            out = target.create_sheet(worksheet.title)
+            layout = layouts.get(worksheet.title, SheetLayout())
+
+            # 列宽、行高和合并区域必须在写入行之前设置
+            for min_col, max_col, width, hidden in layout.columns:
+                letter = get_column_letter(min_col)
+                dimension = ColumnDimension(out, index=letter, min=min_col, max=max_col, hidden=hidden)
+                if width is not None:
+                    dimension.width = width
+                out.column_dimensions[letter] = dimension
+            for row_idx, height, hidden in layout.rows:
+                out.row_dimensions[row_idx] = RowDimension(out, index=row_idx, ht=height, hidden=hidden)
+            for ref in layout.merged:
+                out.merged_cells.add(ref)
+
+            sheet_overrides = overrides.get(worksheet.title, {})
+            for row_idx, row in enumerate(worksheet.iter_rows(), start=1):
+                values = []
+                for col_idx, cell in enumerate(row, start=1):
+                    value = sheet_overrides.get((row_idx, col_idx), cell.value)
+                    if keep_styles and getattr(cell, '_style_id', 0):
+                        out_cell = WriteOnlyCell(out, value)
+                        copier.apply(cell, out_cell)
+                        values.append(out_cell)
+                    else:
+                        values.append(value)
+                out.append(values)
+                cell_count += len(values)
+    finally:
+        source.close()
+
+    target.save(dest)
+    return cell_count
@@ -0,0 +1,174 @@
+"""
+流式、并行的ZIP打包器
+
+生成的工作簿以内存中的字节直接写入压缩包，不再先落盘再读回。使用 DEFLATE 时
+各条目在线程池中并行压缩（zlib 压缩时会释放GIL），按添加顺序写出；只存储时
+不需要压缩，直接在当前线程写出。时间戳和文件属性固定，相同内容每次打出的压缩包
+逐字节相同。写入中途出错时，由打包器创建的压缩包文件会被删除，不留下残缺的文件。
+
+level 取 0 时只存储不压缩，取 1-9 时使用 DEFLATE 压缩。
+"""
+import io
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# 只存储不压缩：.xlsx/.docx 本身已经是压缩过的ZIP，再压缩几乎不变小，只多花时间
+STORED = 0
+DEFAULT_LEVEL = 6
+
+# 固定的条目时间（ZIP格式可表示的最早时间），保证压缩包可重复生成
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+_END_RECORD = struct.Struct('<IHHHHIIH')
+
+_VERSION = 20             # 2.0：支持DEFLATE
+_MADE_BY = (3 << 8) | _VERSION  # Unix，使外部属性中的权限位生效
+_UTF8_FLAG = 0x800
+_EXTERNAL_ATTR = (0o100644 & 0xFFFF) << 16
+_ZIP32_LIMIT = 0xFFFFFFFF
+_ZIP32_MAX_ENTRIES = 0xFFFF
+
+
+def _dos_date_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return ((year - 1980) << 9) | (month << 5) | day, (hour << 11) | (minute << 5) | (second // 2)
+
+
+def _compress(data, level):
+    """在工作线程中计算CRC并压缩，返回 (crc, 压缩后数据)"""
+    crc = zlib.crc32(data)
+    if level == STORED:
+        return crc, data
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return crc, compressor.compress(data) + compressor.flush()
+
+
+class ZipPackager:
+    """
+    用法：
+        with ZipPackager(zip_path, level=STORED) as packager:
+            packager.add('科室考核表.xlsx', data)
+    """
+
+    def __init__(self, file, level=DEFAULT_LEVEL, workers=None, date_time=FIXED_DATE_TIME):
+        """
+        :param file: 压缩包路径或可写的二进制文件对象
+        :param level: 0 为只存储，1-9 为DEFLATE压缩级别
+        :param workers: 压缩线程数，默认为CPU核数；只存储或 workers=1 时不使用线程池
+        :param date_time: 写入所有条目的修改时间
+        """
+        if not 0 <= level <= 9:
+            raise ValueError(f"压缩级别必须在0-9之间: {level}")
+        self.level = level
+        self._own_file = isinstance(file, (str, os.PathLike))
+        self._path = file if self._own_file else None
+        self._file = open(file, 'wb') if self._own_file else file
+        self._executor = None
+        if level != STORED and workers != 1:
+            self._executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+        self._pending = []   # 尚未写出的 (条目名, 原始长度, future)，保持添加顺序
+        self._central = []   # 中央目录记录
+        self._names = set()
+        self._offset = 0
+        self._date, self._time = _dos_date_time(date_time)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._abort()
+
+    def _abort(self):
+        """放弃写入：停止压缩线程；压缩包由打包器创建时删除残缺的文件"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+        if self._own_file:
+            self._file.close()
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+
+    def add(self, arcname, data):
+        """添加一个条目；data 可以是 bytes 或二进制文件对象（如 BytesIO）"""
+        if isinstance(data, io.BytesIO):
+            data = data.getvalue()
+        elif hasattr(data, 'read'):
+            data = data.read()
+        arcname = arcname.replace(os.sep, '/')
+        if arcname in self._names:
+            raise ValueError(f"压缩包中已存在同名条目: {arcname}")
+        self._names.add(arcname)
+        if self._executor is None:
+            self._write_entry(arcname, len(data), _compress(data, self.level))
+            return
+        future = self._executor.submit(_compress, data, self.level)
+        self._pending.append((arcname, len(data), future))
+        self._flush_ready()
+
+    def _flush_ready(self):
+        # 只按添加顺序写出已经压缩完成的前缀部分
+        while self._pending and self._pending[0][2].done():
+            arcname, size, future = self._pending.pop(0)
+            self._write_entry(arcname, size, future.result())
+
+    def _write_entry(self, arcname, size, compressed):
+        crc, payload = compressed
+        name = arcname.encode('utf-8')
+        flags = _UTF8_FLAG if not arcname.isascii() else 0
+        method = zlib.DEFLATED if self.level != STORED else 0
+        if size > _ZIP32_LIMIT or len(payload) > _ZIP32_LIMIT or self._offset > _ZIP32_LIMIT:
+            raise ValueError("文件过大，不支持ZIP64格式")
+        if len(self._central) >= _ZIP32_MAX_ENTRIES:
+            raise ValueError("条目过多，不支持ZIP64格式")
+
+        header = _LOCAL_HEADER.pack(
+            0x04034b50, _VERSION, flags, method, self._time, self._date,
+            crc, len(payload), size, len(name), 0)
+        self._file.write(header)
+        self._file.write(name)
+        self._file.write(payload)
+
+        self._central.append(_CENTRAL_HEADER.pack(
+            0x02014b50, _MADE_BY, _VERSION, flags, method, self._time, self._date,
+            crc, len(payload), size, len(name), 0, 0, 0, 0, _EXTERNAL_ATTR, self._offset) + name)
+        self._offset += len(header) + len(name) + len(payload)
+
+    def close(self):
+        """写出剩余条目和中央目录；出错时与 __exit__ 一样放弃整个压缩包"""
+        try:
+            for arcname, size, future in self._pending:
+                self._write_entry(arcname, size, future.result())
+            self._pending = []
+            directory = b''.join(self._central)
+            # 中央目录的起始位置和结束位置都必须能用32位表示
+            if self._offset + len(directory) > _ZIP32_LIMIT:
+                raise ValueError("文件过大，不支持ZIP64格式")
+            self._file.write(directory)
+            self._file.write(_END_RECORD.pack(
+                0x06054b50, 0, 0, len(self._central), len(self._central),
+                len(directory), self._offset, 0))
+        except BaseException:
+            self._abort()
+            raise
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self._own_file:
+            self._file.close()
+
+
+def package(zip_path, entries, level=DEFAULT_LEVEL, workers=None):
+    """把 (条目名, 数据) 序列写成压缩包，返回条目数量"""
+    count = 0
+    with ZipPackager(zip_path, level=level, workers=workers) as packager:
+        for arcname, data in entries:
+            packager.add(arcname, data)
+            count += 1
+    return count
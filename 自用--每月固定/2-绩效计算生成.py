@@ -1,39 +1,94 @@
 import os
+import sys
+
+# 共享模块位于仓库的“工具”目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '工具'))
+# 启动分析需在其余导入之前开始计时（--profile-startup）
+from startup_profiler import profiler
+
+import filecmp
+import io
+import json
 import re
 import shutil
-import sys
+import tempfile
 import time
-import zipfile
+from bisect import bisect_left
 from datetime import datetime, timedelta
 
-import pandas as pd
-import win32con
-import win32gui
-from win32com.client import Dispatch
+# 公式引擎、pandas、openpyxl、win32com 等较重的模块在用到它们的函数中导入
+from table_cache import file_hash
+from workbook_classifier import STATUS_BROKEN, InputType, classify_directory, save_index
+from zip_packager import STORED, ZipPackager
+
+# 需要计算的模板，按依赖顺序排列（绩效_模板 引用了 积分_模板 的计算结果）
+TEMPLATE_FILES = [
+    "积分_模板.xlsm",
+    "绩效_模板.xlsm",
+    "实际值_模板.xlsm"
+]
+
+# 记录上次运行输入文件哈希与输出位置的清单，用于增量计算
+MANIFEST_FILE = "绩效计算清单.json"
+
+# 由程序生成的输入文件 -> 生成它的源文件
+DERIVED_INPUTS = {"奖罚总计.xlsx": "科室奖罚数据.xlsx"}
+
+# 已知输入工作簿的特征，类型名即整理后的文件名；min_cols 为模板公式引用到的最右一列
+INPUT_TYPES = [
+    InputType("科室奖罚数据", keywords=["科室奖罚数据"], headers=["科室名称", "金额"], min_cols=4),
+    InputType("奖罚总计", headers=["科室", "金额"], min_cols=2),
+    InputType("行政科室评分表", keywords=["行政科室评分表"], sheets=["KPI评分"]),
+    InputType("考核数据存储", keywords=["考核数据存储"], sheets=["Sheet1", "Sheet2", "Sheet3", "Sheet4"],
+              sheet="Sheet1", min_cols=40),
+    InputType("业务实际值实际值上传模板", keywords=["业务实际值"], sheet="Sheet1", min_cols=35),
+    InputType("职能实际值实际值上传模板", keywords=["职能实际值"], sheet="Sheet1", min_cols=10),
+    InputType("服务人次工作量通用上传模板", keywords=["服务人次工作量通用"], sheet="Sheet1", min_cols=10),
+    InputType("门诊人次工作量通用上传模板", keywords=["门诊人次工作量通用"], sheet="Sheet1", min_cols=4),
+    InputType("服务人次工作量不通用上传模板", keywords=["服务人次工作量不通用"], sheet="Sheet1", min_cols=4),
+    InputType("资源消耗工作量不通用上传模板", keywords=["资源消耗工作量不通用"], sheet="Sheet1", min_cols=4),
+    InputType("垂直护理工作量通用上传模板", keywords=["垂直护理工作量通用"], sheets=["Sheet1", "Sheet2", "Sheet3"],
+              sheet="Sheet1", min_cols=8),
+]
+
+
+def load_manifest():
+    """读取上次运行的清单，不存在或损坏时返回空清单"""
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(manifest):
+    with open(MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
 
 
 def extract_resources():
-    """提取打包的资源文件到当前目录"""
+    """提取打包的资源文件到当前目录；当前目录中已有相同的文件时跳过"""
     # 获取资源文件路径
     if getattr(sys, 'frozen', False):
         # 如果是打包后的程序
         base_path = sys._MEIPASS
     else:
-        # 如果是开发环境
-        base_path = os.path.abspath(os.path.dirname(__file__))
-
-    # 需要提取的文件列表
-    files_to_extract = [
-        "积分_模板.xlsm",
-        "绩效_模板.xlsm",
-        "实际值_模板.xlsm"
-    ]
+        # 如果是开发环境（模板位于 template 目录）
+        base_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'template')
 
     # 提取文件
-    for filename in files_to_extract:
+    for filename in TEMPLATE_FILES:
         source = os.path.join(base_path, filename)
         destination = os.path.join(os.getcwd(), filename)
 
+        if not os.path.exists(source):
+            print(f"释放文件 {filename} 失败: 未找到 {source}")
+            continue
+
+        # 已有文件与打包的模板相同时不再复制（先比较大小和修改时间，不同再比较内容）
+        if os.path.exists(destination) and filecmp.cmp(source, destination, shallow=True):
+            continue
+
         # 如果目标文件已存在，先删除
         if os.path.exists(destination):
             try:
@@ -49,40 +104,67 @@ def extract_resources():
         except Exception as e:
             print(f"释放文件 {filename} 失败: {str(e)}")
 
+
+def _rename_by_filename(file):
+    """无法按内容识别时，沿用按文件名整理的规则"""
+    # 处理类似"2024年11月绩效业务实际值实际值上传模板_20241122155535.xlsx"的情况
+    if '_' in file:
+        new_name = file.split('_')[0]
+        # 移除年月
+        new_name = re.sub(r'\d{4}年\d{1,2}月绩效', '', new_name)
+        return new_name + '.xlsx'
+    elif '服务人次工作量不通用上传模板' in file:
+        return '服务人次工作量不通用上传模板' + '.xlsx'
+    elif '行政科室评分表' in file:
+        return '行政科室评分表.xlsx'
+    # 处理类似"科室奖罚数据2024011.xlsx"的情况
+    return re.sub(r'\d+', '', file)
+
+
 def rename_excel_files():
-    """重命名Excel文件，移除日期部分"""
-    # 获取当前目录下所有xlsx文件
-    excel_files = [f for f in os.listdir('.') if f.endswith('.xlsx')]
-
-    for file in excel_files:
-        # 处理类似"2024年11月绩效业务实际值实际值上传模板_20241122155535.xlsx"的情况
-        if '_' in file:
-            new_name = file.split('_')[0]
-            # 移除年月
-            new_name = re.sub(r'\d{4}年\d{1,2}月绩效', '', new_name)
-            new_name = new_name + '.xlsx'
-        elif '服务人次工作量不通用上传模板' in file:
-            new_name = '服务人次工作量不通用上传模板' + '.xlsx'
-        elif '行政科室评分表' in file:
-            new_name = '行政科室评分表.xlsx'
-        else:
-            # 处理类似"科室奖罚数据2024011.xlsx"的情况
-            new_name = re.sub(r'\d+', '', file)
+    """
+    按表头特征识别输入文件并重命名为标准文件名，识别结果写入输入文件索引。
+
+    返回索引 {标准文件名: 条目}，条目包含类型、月份、工作表、表头行和行数。
+    """
+    index = {}
+    for file, entry in classify_directory(INPUT_TYPES).items():
+        if entry['status'] == STATUS_BROKEN:
+            print(f'无法打开 {file}，可能下载不完整，已跳过: {entry.get("error")}')
+            continue
+        new_name = entry['type'] + '.xlsx' if entry['type'] else _rename_by_filename(file)
 
         # 如果新文件名不同于原文件名，则重命名
         if new_name != file:
             try:
                 os.rename(file, new_name)
                 print(f'已重命名: {file} -> {new_name}')
+                entry = dict(entry, original=file)
             except Exception as e:
                 print(f'重命名失败 {file}: {str(e)}')
+                new_name = file
+        index[new_name] = entry
 
+    save_index(index)
+    return index
+
+
+def process_penalty_reward_data(manifest, index=None):
+    """处理科室奖罚数据，生成汇总报告；源文件未变化且汇总已存在时跳过"""
+    source, output = "科室奖罚数据.xlsx", "奖罚总计.xlsx"
+    source_hash = file_hash(source) if os.path.exists(source) else None
+    derived = manifest.setdefault('derived', {})
+    if source_hash and derived.get(output) == source_hash and os.path.exists(output):
+        print(f'{source}未变化，沿用已有的{output}')
+        return
+
+    from table_cache import read_excel_cached
 
-def process_penalty_reward_data():
-    """处理科室奖罚数据，生成汇总报告"""
     try:
         # 读取科室奖罚数据文件
-        df = pd.read_excel('科室奖罚数据.xlsx', header=1)  # 第二行为列名
+        # 表头行取自输入文件索引，默认第二行为列名
+        header_row = ((index or {}).get(source) or {}).get('header_row') or 2
+        df = read_excel_cached('科室奖罚数据.xlsx', log=print, header=header_row - 1)
 
         # 按科室名称分组并计算金额总和
         summary = df.groupby('科室名称')['金额'].sum().reset_index()
@@ -92,6 +174,8 @@ def process_penalty_reward_data():
 
         # 保存为新的Excel文件
         summary.to_excel('奖罚总计.xlsx', index=False)
+        # 汇总文件每次生成的字节都不同，以源文件的哈希代表它的内容
+        derived[output] = source_hash
         print('已生成奖罚总计.xlsx')
 
     except FileNotFoundError:
@@ -100,8 +184,115 @@ def process_penalty_reward_data():
         print(f'处理科室奖罚数据时出错: {str(e)}')
 
 
+def _vba_double(value, blank_as_zero=False):
+    """
+    模拟VBA的CDbl：逻辑值True为-1，无法转换时抛出异常。
+
+    :param blank_as_zero: 用于声明为 Double/Integer 的参数：空单元格传入时VBA得到0，
+                          空单元格和空文字都按0处理
+    """
+    if blank_as_zero and (value is None or value == ''):
+        return 0.0
+    if isinstance(value, bool):
+        return -1.0 if value else 0.0
+    return float(value)
+
+
+def calculate_score(actual, weight, target, deduction, upper, lower, method):
+    """积分_模板中VBA函数“计算得分”的Python实现"""
+    deduction = _vba_double(deduction, blank_as_zero=True)
+    upper = _vba_double(upper, blank_as_zero=True)
+    lower = _vba_double(lower, blank_as_zero=True)
+    method = int(round(_vba_double(method, blank_as_zero=True)))
+
+    # 检查输入值是否为空
+    if actual is None or target is None or weight is None:
+        return "--"
+
+    # 尝试将输入值转换为数字，如果失败则返回"--"
+    try:
+        actual_value = _vba_double(actual)
+        target_value = _vba_double(target)
+        weight_value = _vba_double(weight)
+    except (TypeError, ValueError):
+        return "--"
+
+    try:
+        base_score = 0.0
+        if method == 0:
+            # 增长量
+            diff = actual_value - target_value
+            base_score = weight_value if diff <= 0 else weight_value - abs(diff) * deduction
+        elif method == 1:
+            # 减少量
+            diff = actual_value - target_value
+            base_score = weight_value if diff >= 0 else weight_value - abs(diff) * deduction
+        elif method == 2:
+            # 增长率
+            ratio = actual_value / target_value
+            base_score = weight_value if ratio >= 0 else weight_value - round(abs(ratio), 2) * 100 * deduction
+        elif method == 3:
+            # 下降率
+            ratio = actual_value / target_value
+            base_score = weight_value if ratio >= 1 else round(weight_value - abs((1 - ratio) * 100 * deduction), 2)
+        elif method == 4:
+            # 增长率未超过10%
+            ratio = actual_value / target_value
+            base_score = weight_value if ratio <= 1.1 else round(weight_value - abs((1.1 - ratio) * 100 * deduction), 2)
+        elif method == 5:
+            # 下降率未超过10%
+            ratio = actual_value / target_value
+            base_score = weight_value if ratio >= 0.9 else round(weight_value - abs((0.9 - ratio) * 100 * deduction), 2)
+    except ZeroDivisionError:
+        return "--"
+
+    # 判断是否低于阈值
+    if base_score < lower:
+        return lower
+    if base_score > upper:
+        return upper
+    return round(base_score, 2)
+
+
+def actual_value_passthrough(actual, weight, target, deduction, upper, lower, method):
+    """实际值_模板中的“计算得分”：参数校验与积分模板相同，但返回实际值本身"""
+    if calculate_score(actual, weight, target, deduction, upper, lower, method) == "--":
+        return "--"
+    return actual
+
+
+def ward_discount_ratio(ratio):
+    """绩效_模板中VBA函数“病区折扣比例”的Python实现"""
+    ratio = _vba_double(ratio, blank_as_zero=True)
+    if ratio < 0:
+        return 0.5
+    bounds = [0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95]
+    index = bisect_left(bounds, ratio)
+    return bounds[index] if index < len(bounds) else 1.0
+
+
+def outpatient_discount_ratio(ratio):
+    """绩效_模板中VBA函数“门诊折扣比例”的Python实现"""
+    ratio = _vba_double(ratio, blank_as_zero=True)
+    if ratio < 0:
+        return 0.1
+    bounds = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+    index = bisect_left(bounds, ratio)
+    return bounds[index] if index < len(bounds) else 1.0
+
+
+# 各模板中VBA自定义函数对应的Python实现
+TEMPLATE_FUNCTIONS = {
+    "积分_模板.xlsm": {"计算得分": calculate_score},
+    "绩效_模板.xlsm": {"病区折扣比例": ward_discount_ratio, "门诊折扣比例": outpatient_discount_ratio},
+    "实际值_模板.xlsm": {"计算得分": actual_value_passthrough},
+}
+
+
 def find_dialog_and_click_yes():
     """查找Excel对话框并自动点击"是"按钮"""
+    import win32con
+    import win32gui
 
     def callback(handle, dialog_list):
         title = win32gui.GetWindowText(handle)
@@ -153,9 +344,155 @@ def create_file_name(original_name):
     return f"{year}年{month:02d}月{file_type}文件.xlsx"
 
 
-def process_excel_files(files_to_convert):
-    """处理Excel文件并创建ZIP包"""
-    input("\n所有文件更新完成后，请按回车键继续...")
+def wait_for_inputs():
+    """等待用户更新输入文件；无人值守运行（标准输入不是终端）时直接继续"""
+    if sys.stdin is not None and sys.stdin.isatty():
+        input("\n所有文件更新完成后，请按回车键继续...")
+
+
+def prepare_target_folder(keep_existing=False):
+    """创建（或清空）桌面上的输出文件夹，返回 (桌面路径, 文件夹名, 文件夹路径)"""
+    folder_name = create_folder_name()
+    desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
+    target_folder = os.path.join(desktop_path, folder_name)
+
+    # 如果文件夹已存在，先删除它（增量计算时保留上次的输出）
+    if os.path.exists(target_folder) and not keep_existing:
+        shutil.rmtree(target_folder)
+
+    # 创建新文件夹
+    os.makedirs(target_folder, exist_ok=True)
+    return desktop_path, folder_name, target_folder
+
+
+def collect_input_hashes(manifest):
+    """记录当前目录下全部输入工作簿（rename_excel_files 整理后的 .xlsx）的内容哈希"""
+    hashes = {
+        filename: file_hash(filename)
+        for filename in sorted(os.listdir('.'))
+        if filename.endswith('.xlsx') and filename not in DERIVED_INPUTS
+    }
+    for derived_name in DERIVED_INPUTS:
+        if derived_name in manifest.get('derived', {}) and os.path.exists(derived_name):
+            hashes[derived_name] = manifest['derived'][derived_name]
+        elif os.path.exists(derived_name):
+            hashes[derived_name] = file_hash(derived_name)
+    return hashes
+
+
+def create_zip(desktop_path, folder_name, entries):
+    """把生成的文件（(文件名, 字节) 序列）直接打包为桌面上的ZIP文件"""
+    zip_path = os.path.join(desktop_path, f"{folder_name}.zip")
+    with ZipPackager(zip_path, level=STORED) as packager:
+        for arcname, data in entries:
+            packager.add(arcname, data)
+
+    print(f"已创建ZIP文件: {zip_path}")
+
+
+def save_output(data, file_path):
+    """把内存中生成的文件写到输出文件夹，返回 (文件名, 字节) 供打包使用"""
+    with open(file_path, 'wb') as f:
+        f.write(data)
+    return os.path.basename(file_path), data
+
+
+def process_excel_files(files_to_convert, manifest, full=False):
+    """
+    用内置公式引擎计算模板、另存为只含数值的xlsx并创建ZIP包（无需安装Excel）。
+
+    清单中记录了上次运行时各输入文件和模板的哈希；再次运行同一月份时只重算受
+    变化输入影响的单元格，未受影响的模板直接沿用上次的输出文件。
+    """
+    from formula_engine import FormulaEngine
+
+    wait_for_inputs()
+
+    input_hashes = collect_input_hashes(manifest)
+    template_hashes = {os.path.basename(path): file_hash(path) for path in files_to_convert}
+
+    folder_name = create_folder_name()
+    desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
+    target_folder = os.path.join(desktop_path, folder_name)
+    output_paths = {
+        os.path.basename(path): os.path.join(target_folder, create_file_name(os.path.basename(path)))
+        for path in files_to_convert
+    }
+
+    previous = manifest if manifest.get('folder') == target_folder and not full else {}
+    previous_inputs = previous.get('inputs', {})
+    previous_templates = previous.get('templates', {})
+    changed_inputs = {
+        name for name in set(input_hashes) | set(previous_inputs)
+        if input_hashes.get(name) != previous_inputs.get(name)
+    }
+    changed_templates = {
+        name for name, digest in template_hashes.items()
+        if previous_templates.get(name) != digest or not os.path.exists(output_paths[name])
+    }
+
+    zip_path = os.path.join(desktop_path, f"{folder_name}.zip")
+    if not changed_inputs and not changed_templates and os.path.exists(zip_path):
+        print("输入文件和模板均未变化，沿用上次的计算结果")
+        return
+
+    if changed_inputs and previous:
+        print(f"有变化的输入文件: {', '.join(sorted(changed_inputs))}")
+
+    prepare_target_folder(keep_existing=bool(previous))
+
+    # 所有模板放进同一个引擎，跨模板引用（绩效_模板 -> 积分_模板）按依赖顺序计算
+    engine = FormulaEngine(os.getcwd())
+    for file_path in files_to_convert:
+        original_name = os.path.basename(file_path)
+        engine.load_template(file_path, TEMPLATE_FUNCTIONS.get(original_name))
+
+    affected = engine.downstream(changed_inputs, changed_templates)
+    for name in template_hashes:
+        if name not in changed_templates:
+            engine.seed_values(name, output_paths[name])
+    for name, sheets in affected.items():
+        print(f"需要重算: {name}（{', '.join(sorted(sheets))}）")
+
+    start = time.perf_counter()
+    formula_count = engine.calculate(dirty_only=True)
+    print(f"已计算 {formula_count} 个公式，用时 {time.perf_counter() - start:.2f} 秒")
+
+    entries = []
+    for name, new_file_path in output_paths.items():
+        if name not in affected:
+            with open(new_file_path, 'rb') as f:
+                entries.append((os.path.basename(new_file_path), f.read()))
+            print(f"未受影响，沿用文件: {new_file_path}")
+            continue
+        buffer = io.BytesIO()
+        engine.save_values(name, buffer)
+        entries.append(save_output(buffer.getvalue(), new_file_path))
+        print(f"已保存文件: {new_file_path}")
+
+    create_zip(desktop_path, folder_name, entries)
+
+    manifest.update({
+        'folder': target_folder,
+        'inputs': input_hashes,
+        'templates': template_hashes,
+        'feeds': engine.feeds(),
+    })
+    save_manifest(manifest)
+
+    print("所有文件处理完成!")
+
+
+def process_excel_files_with_excel(files_to_convert):
+    """通过Excel（win32com）计算模板并创建ZIP包，仅适用于安装了Office的Windows"""
+    from win32com.client import Dispatch
+    from xlsx_freezer import freeze_workbook
+
+    # Excel计算的结果不经过清单，删除清单使下次引擎计算从头开始
+    if os.path.exists(MANIFEST_FILE):
+        os.remove(MANIFEST_FILE)
+
+    wait_for_inputs()
     # 创建Excel应用实例
     excel = Dispatch("Excel.Application")
     excel.Visible = False
@@ -167,18 +504,9 @@ def process_excel_files(files_to_convert):
     try:
 
         # 创建目标文件夹
-        folder_name = create_folder_name()
-        desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
-        target_folder = os.path.join(desktop_path, folder_name)
-
-        # 如果文件夹已存在，先删除它
-        if os.path.exists(target_folder):
-            shutil.rmtree(target_folder)
+        desktop_path, folder_name, target_folder = prepare_target_folder()
 
-        # 创建新文件夹
-        os.makedirs(target_folder)
-
-        saved_files = []  # 记录保存的文件路径
+        entries = []  # 记录保存的文件 (文件名, 字节)
 
         for file_path in files_to_convert:
             # 获取原始文件名
@@ -188,38 +516,35 @@ def process_excel_files(files_to_convert):
             new_filename = create_file_name(original_name)
             new_file_path = os.path.join(target_folder, new_filename)
 
+            # Excel只负责计算，计算结果随副本一起保存为缓存值
+            calculated_copy = os.path.join(tempfile.gettempdir(), f"calculated_{original_name}")
+
             # 打开工作簿
             workbook = excel.Workbooks.Open(file_path)
 
             try:
                 # 更新所有计算
                 workbook.Application.CalculateFull()
-
-                # 遍历所有工作表
-                for sheet in workbook.Worksheets:
-                    used_range = sheet.UsedRange
-                    used_range.Value = used_range.Value
-
-                # 保存文件
-                workbook.SaveAs(new_file_path, FileFormat=51, ConflictResolution=2)
+                workbook.SaveCopyAs(calculated_copy)
 
                 # 处理可能出现的对话框
                 find_dialog_and_click_yes()
 
-                saved_files.append(new_file_path)
-                print(f"已保存文件: {new_file_path}")
-
             finally:
                 workbook.Close(SaveChanges=False)
 
-        # 创建ZIP文件
-        zip_path = os.path.join(desktop_path, f"{folder_name}.zip")
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file_path in saved_files:
-                arcname = os.path.basename(file_path)
-                zipf.write(file_path, arcname)
+            # 在Python中流式冻结为只含数值的xlsx，不再通过COM逐个单元格回写
+            buffer = io.BytesIO()
+            try:
+                freeze_workbook(calculated_copy, buffer)
+            finally:
+                os.remove(calculated_copy)
 
-        print(f"已创建ZIP文件: {zip_path}")
+            entries.append(save_output(buffer.getvalue(), new_file_path))
+            print(f"已保存文件: {new_file_path}")
+
+        # 创建ZIP文件
+        create_zip(desktop_path, folder_name, entries)
 
     finally:
         excel.Quit()
@@ -230,23 +555,24 @@ def process_excel_files(files_to_convert):
 def main():
     """主函数 - 按顺序执行所有步骤"""
     print('开始释放必要文件...')
-    extract_resources()
+    with profiler.phase('释放模板'):
+        extract_resources()
 
     print('开始处理Excel文件...')
+    manifest = load_manifest()
+    profiler.mark_ready()
 
     # 第一步：重命名文件和处理奖罚数据
     print('\n===== 执行第一步：重命名文件和处理奖罚数据 =====')
-    rename_excel_files()
-    process_penalty_reward_data()
+    with profiler.phase('识别输入文件'):
+        index = rename_excel_files()
+    with profiler.phase('处理奖罚数据'):
+        process_penalty_reward_data(manifest, index)
 
     # 第二步：处理模板文件并创建ZIP包
     print('\n===== 执行第二步：处理模板文件并创建ZIP包 =====')
     current_dir = os.getcwd()
-    files_to_convert = [
-        os.path.join(current_dir, "积分_模板.xlsm"),
-        os.path.join(current_dir, "绩效_模板.xlsm"),
-        os.path.join(current_dir, "实际值_模板.xlsm")
-    ]
+    files_to_convert = [os.path.join(current_dir, filename) for filename in TEMPLATE_FILES]
 
     # 检查文件是否存在
     for file_path in files_to_convert:
@@ -254,7 +580,12 @@ def main():
             print(f"错误：文件 {file_path} 不存在！")
             exit(1)
 
-    process_excel_files(files_to_convert)
+    # 默认使用内置公式引擎增量计算（--full 强制全部重算）；加 --excel 参数时沿用Excel计算
+    with profiler.phase('计算模板'):
+        if '--excel' in sys.argv:
+            process_excel_files_with_excel(files_to_convert)
+        else:
+            process_excel_files(files_to_convert, manifest, full='--full' in sys.argv)
 
     print('\n所有步骤执行完成!')
 
@@ -275,10 +606,10 @@ added_files = [
 
 a = Analysis(
     ['绩效计算生成.py'],
-    pathex=[],
+    pathex=['../工具'],
     binaries=[],
     datas=added_files,
-    hiddenimports=['win32timezone'],
+    hiddenimports=['win32timezone', 'win32com.client', 'win32con', 'win32gui'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,11 +1,333 @@
+import argparse
+import io
+import multiprocessing
 import os
+import re
+import sys
+import time
 import tkinter as tk
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from tkinter import filedialog, scrolledtext, messagebox
 
 from docx import Document
 from openpyxl import load_workbook
 
+# 共享模块位于仓库的“工具”目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '工具'))
+from docx_renderer import DocxTemplate, render_many, write_if_changed
+from tk_worker import TaskCancelled, TaskRunner
+from workbook_classifier import extract_month
+
+# 可选的自定义Word模板；不存在时使用内置的默认版式
+LETTER_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'template', '绩效结果模板.docx')
+
+# 模板中整段重复的占位符（每条奖罚明细一段，没有明细时整段删除）
+LIST_FIELDS = ['奖罚明细']
+
+OUTPUT_COMBINED = "合并为一个文档"
+OUTPUT_SEPARATE = "每个科室一个文档"
+OUTPUT_BOTH = "两者都生成"
+# 命令行 --mode 参数
+OUTPUT_MODES = {'combined': OUTPUT_COMBINED, 'separate': OUTPUT_SEPARATE, 'both': OUTPUT_BOTH}
+
+
+# 考核结果中一个科室的数据，金额均已转换为浮点数
+PerformanceRow = namedtuple('PerformanceRow', [
+    'department', 'performance_base', 'assessment_score',
+    'actual_performance', 'rewards_penalties', 'final_amount',
+])
+
+# 本次运行中已解析的绩效文件：(路径, 修改时间, 大小) -> (工作表名列表, [PerformanceRow, ...])
+_performance_cache = {}
+
+
+def load_performance_rows(file_path):
+    """
+    读取绩效文件“考核结果”表第39行起、“合计”之前的科室数据。
+
+    结果按 (路径, 修改时间, 大小) 缓存在进程内，文件未变化时重复选择不再解析。
+    :return: (工作表名列表, [PerformanceRow, ...])
+    """
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    if key in _performance_cache:
+        return _performance_cache[key]
+
+    # data_only=True 确保读取显示数据而非公式
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet_names = wb.sheetnames
+        # 检查是否存在“考核结果”工作表
+        if "考核结果" not in sheet_names:
+            raise ValueError("工作表 '考核结果' 不存在，请检查文件。")
+
+        rows = []
+        # 动态读取行，直到第一列出现“合计”为止
+        for values in wb["考核结果"].iter_rows(min_row=39, max_col=8, values_only=True):  # 从第39行开始
+            if values[0] == "合计":
+                break  # 遇到“合计”停止读取
+            # 检查序号列和科室名称
+            if values[0] and values[1]:
+                rows.append(PerformanceRow(values[1], *(float(value or 0) for value in values[3:8])))
+    finally:
+        wb.close()
+
+    _performance_cache.clear()  # 只保留最近一次选择的文件
+    _performance_cache[key] = (sheet_names, rows)
+    return sheet_names, rows
+
+
+def build_default_template():
+    """用 python-docx 生成与原有版式相同的默认模板（固定文档属性，保证输出可重复）"""
+    doc = Document()
+    for text in ["{{标题}}", "{{称呼}}", "科室名称：{{科室名称}}", "应发绩效：{{应发绩效}}",
+                 "考核得分：{{考核得分}}", "实发绩效：{{实发绩效}}", "奖惩合计：{{奖惩合计}}",
+                 "实际发放（二次分配）金额：{{实际发放金额}}", "{{奖罚明细}}"]:
+        doc.add_paragraph(text)
+    # 添加空行
+    doc.add_paragraph()
+    doc.add_paragraph()
+    doc.core_properties.created = datetime(2000, 1, 1)
+    doc.core_properties.modified = datetime(2000, 1, 1)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def load_letter_template():
+    """编译Word模板（每次生成只编译一次）"""
+    if os.path.exists(LETTER_TEMPLATE):
+        with open(LETTER_TEMPLATE, 'rb') as f:
+            data = f.read()
+    else:
+        data = build_default_template()
+    return DocxTemplate(data, list_fields=LIST_FIELDS)
+
+
+def safe_filename(name):
+    """去掉文件名中不允许的字符"""
+    return re.sub(r'[\\/:*?"<>|]', '_', str(name))
+
+
+def load_penalty_index(file_path):
+    """
+    流式读取奖罚文件，返回 ({科室: [(奖罚类型, 金额, 备注), ...]}, 读取的记录行数)。
+
+    只读模式逐行读取前四列，不构建整张表的单元格；空行跳过，读到最后一行数据为止。
+    """
+    index = {}
+    row_count = 0
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = wb.active  # 默认读取第一个工作表
+        # 从第二行开始读取
+        for penalty_type, department, amount, remark in sheet.iter_rows(
+                min_row=2, max_col=4, values_only=True):
+            if penalty_type is None and department is None and amount is None and remark is None:
+                continue
+            index.setdefault(department, []).append((penalty_type, amount, remark))
+            row_count += 1
+    finally:
+        wb.close()
+    return index, row_count
+
+
+def previous_month(today=None):
+    """返回上个月的 (年, 月)"""
+    current_date = today or datetime.now()
+    if current_date.month == 1:
+        return current_date.year - 1, 12
+    return current_date.year, current_date.month - 1
+
+
+def generate_letters(rows, penalty_data, year, month, output_dir, mode,
+                     log=print, progress=None, check_cancelled=None, render_workers=None):
+    """
+    生成一个月份的绩效结果文档。
+
+    :param rows: load_performance_rows 读出的 [PerformanceRow, ...]
+    :param penalty_data: load_penalty_index 读出的 {科室: [(奖罚类型, 金额, 备注), ...]}
+    :param mode: OUTPUT_COMBINED / OUTPUT_SEPARATE / OUTPUT_BOTH
+    :param progress: 可选的进度回调 progress(已完成, 总数)
+    :param check_cancelled: 可选的取消检查，取消时抛出异常
+    :param render_workers: 每个科室一个文档时的进程数（None 为CPU核数，1 为不开进程池）
+    :return: {'save_path', 'count', 'departments_with_penalties'}
+    """
+    progress = progress or (lambda done, total: None)
+    check_cancelled = check_cancelled or (lambda: None)
+
+    # 编译Word模板
+    template = load_letter_template()
+
+    # 用于存储有奖罚明细的科室名称
+    departments_with_penalties = []
+
+    # 考核结果中的科室数据（已在读取时转换为浮点数）
+    letters = []
+    for index, row in enumerate(rows, start=1):
+        check_cancelled()
+        progress(index, len(rows))
+        department = row.department
+        if "护理" in department:
+            greeting = f"护士长您好，{year}年{month}月科室绩效结果如下所示，请查收（考核表和简要数据分析见附件）"
+        else:
+            greeting = f"主任您好，{year}年{month}月科室绩效结果如下所示，请查收（考核表和简要数据分析见附件）"
+
+        # 检查是否有奖罚数据
+        penalty_lines = []
+        if department in penalty_data:
+            penalty_lines.append("单项奖罚明细：")
+            for penalty_type, amount, remark in penalty_data[department]:
+                penalty_lines.append(f"金额：{str(amount).replace('=', '')}，备注：{remark.replace('=', '')}")
+            # 将有奖罚明细的科室名称添加到列表中
+            departments_with_penalties.append(department)
+
+        letters.append((department, {
+            '标题': f"{department}{year}年{month}月绩效结果",
+            '称呼': greeting,
+            '科室名称': department,
+            '应发绩效': format(row.performance_base, '.2f'),
+            '考核得分': format(row.assessment_score, '.2f'),
+            '实发绩效': format(row.actual_performance, '.2f'),
+            '奖惩合计': format(row.rewards_penalties, '.2f'),
+            '实际发放金额': format(row.final_amount, '.2f'),
+            '奖罚明细': penalty_lines,
+        }))
+
+    save_path = os.path.join(output_dir, f"{year}年{month}月 绩效结果.docx")
+
+    if mode in (OUTPUT_COMBINED, OUTPUT_BOTH):
+        # 所有科室依次写入同一个文档
+        write_if_changed(save_path, template.render_combined(values for _, values in letters))
+        log(f"文件已保存: {save_path}")
+
+    if mode in (OUTPUT_SEPARATE, OUTPUT_BOTH):
+        # 每个科室单独一个文档，在进程池中并行生成；内容未变的文件不重写
+        folder = os.path.join(output_dir, f"{year}年{month}月 绩效结果")
+        os.makedirs(folder, exist_ok=True)
+        written = 0
+        for index, (department, data) in enumerate(render_many(template, letters, render_workers), start=1):
+            check_cancelled()
+            progress(index, len(letters))
+            if write_if_changed(os.path.join(folder, f"{safe_filename(department)}.docx"), data):
+                written += 1
+            log(f"已处理科室: {department}")
+        log(f"科室文档已保存到: {folder}（更新 {written} 个，未变化 {len(letters) - written} 个）")
+        if mode == OUTPUT_SEPARATE:
+            save_path = folder
+
+    log(f"成功处理 {len(letters)} 行数据")
+    return {
+        'save_path': save_path,
+        'count': len(letters),
+        'departments_with_penalties': sorted(set(departments_with_penalties)),
+    }
+
+
+def print_penalty_departments(departments, log=print):
+    """打印有奖罚明细的科室名称，默认输出到控制台"""
+    if departments:
+        log("有单项奖罚明细的科室名称:")
+        for dept in departments:
+            log(dept)
+    else:
+        log("没有科室有单项奖罚明细。")
+
+
+# 批量模式中的一个月份
+MonthJob = namedtuple('MonthJob', ['performance_file', 'penalty_file', 'year', 'month'])
+
+
+def find_month_jobs(directory):
+    """
+    在目录（含子目录）中查找“YYYY年MM月绩效文件.xlsx”，并为每个月份配对奖罚文件：
+    优先同一目录中文件名带有同一月份的“科室奖罚数据*.xlsx”，其次同目录的“科室奖罚数据.xlsx”。
+
+    同一月份的绩效文件出现在多个子目录中时只保留（按目录名排序）第一个，其余的提示后跳过：
+    同一月份的输出文件名相同，不能同时生成。
+    """
+    jobs = {}
+    for folder, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        penalty_files = [name for name in filenames if name.startswith('科室奖罚数据') and name.endswith('.xlsx')]
+        for filename in sorted(filenames):
+            match = re.match(r'(\d{4})年(\d{1,2})月绩效文件\.xlsx$', filename)
+            if not match:
+                continue
+            year, month = int(match.group(1)), int(match.group(2))
+            path = os.path.join(folder, filename)
+            if (year, month) in jobs:
+                print(f"{year}年{month}月 的绩效文件重复，跳过: {path}（使用 {jobs[(year, month)].performance_file}）")
+                continue
+            same_month = [name for name in penalty_files if extract_month(name) == f"{year}-{month:02d}"]
+            candidates = same_month or [name for name in penalty_files if name == '科室奖罚数据.xlsx']
+            if not candidates:
+                print(f"未找到 {year}年{month}月 的奖罚文件，跳过: {path}")
+                continue
+            jobs[(year, month)] = MonthJob(path, os.path.join(folder, candidates[0]), year, month)
+    return sorted(jobs.values(), key=lambda job: (job.year, job.month))
+
+
+def _run_month(job, output_dir, mode, parallel_months):
+    """批量模式中处理一个月份（在进程池中运行），返回汇总信息"""
+    started = time.perf_counter()
+    lines = []
+    _, rows = load_performance_rows(job.performance_file)
+    penalty_data, penalty_count = load_penalty_index(job.penalty_file)
+    # 多个月份已经并行时，月份内不再另开进程池
+    result = generate_letters(rows, penalty_data, job.year, job.month, output_dir, mode,
+                              log=lines.append, render_workers=1 if parallel_months else None)
+    result.update(job=job, penalties=penalty_count, seconds=time.perf_counter() - started, log=lines)
+    return result
+
+
+def generate_batch(jobs, output_dir, mode=OUTPUT_COMBINED, workers=None, log=print):
+    """
+    批量生成多个月份的绩效结果文档，各月份在进程池中并行处理。
+
+    :param jobs: [MonthJob, ...]
+    :return: 各月份的汇总信息列表（与 jobs 顺序相同）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    workers = min(workers or os.cpu_count(), len(jobs))
+    results = []
+    if workers <= 1:
+        for job in jobs:
+            try:
+                results.append(_run_month(job, output_dir, mode, False))
+            except Exception as e:
+                log(f"{job.year}年{job.month}月 处理失败: {str(e)}")
+                results.append(None)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_run_month, job, output_dir, mode, True) for job in jobs]
+            for job, future in zip(jobs, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    log(f"{job.year}年{job.month}月 处理失败: {str(e)}")
+                    results.append(None)
+
+    # 各月份的处理日志在月份结束后按顺序输出，并行时也不会交错
+    for job, result in zip(jobs, results):
+        if result:
+            log(f"===== {job.year}年{job.month:02d}月 =====")
+            for line in result['log']:
+                log(line)
+            print_penalty_departments(result['departments_with_penalties'], log=log)
+
+    log("===== 批量生成汇总 =====")
+    for job, result in zip(jobs, results):
+        if result:
+            log(f"{job.year}年{job.month:02d}月：{result['count']} 个科室，奖罚记录 {result['penalties']} 行，"
+                f"用时 {result['seconds']:.2f} 秒 -> {result['save_path']}")
+    log(f"共 {sum(1 for result in results if result)}/{len(jobs)} 个月份，"
+        f"总用时 {time.perf_counter() - started:.2f} 秒")
+    return results
+
 
 class PerformanceProcessor:
     def __init__(self):
@@ -18,7 +340,7 @@ class PerformanceProcessor:
 
         # 设置窗口大小和位置
         window_width = 600
-        window_height = 400
+        window_height = 460
         x = (screen_width - window_width) // 2
         y = (screen_height - window_height) // 2
         self.root.geometry(f"{window_width}x{window_height}+{x}+{y}")
@@ -43,6 +365,14 @@ class PerformanceProcessor:
         )
         self.select_penalty_button.pack(pady=20)
 
+        # 输出方式：合并文档、每个科室一个文档或两者都生成
+        # （后台线程不能读取Tk变量，选择结果另存在 selected_output_mode 中）
+        self.output_mode = tk.StringVar(value=OUTPUT_COMBINED)
+        self.selected_output_mode = OUTPUT_COMBINED
+        self.output_menu = tk.OptionMenu(self.root, self.output_mode, OUTPUT_COMBINED, OUTPUT_SEPARATE, OUTPUT_BOTH,
+                                         command=self.set_output_mode)
+        self.output_menu.pack()
+
         # 创建日志显示框
         self.log_text = scrolledtext.ScrolledText(
             self.root,
@@ -51,177 +381,138 @@ class PerformanceProcessor:
         )
         self.log_text.pack(pady=10)
 
+        # 读取和生成在后台线程中执行，日志和进度经队列批量刷新到界面
+        self.runner = TaskRunner(
+            self.root, self.append_log,
+            busy_widgets=[self.select_button, self.select_penalty_button, self.output_menu]
+        )
+        self.runner.frame.pack(fill=tk.X, padx=15)
+
         self.penalty_data = {}  # 用于存储奖罚数据
         self.performance_file_path = None  # 用于存储绩效文件路径
         self.penalty_file_path = None  # 用于存储奖罚文件路径
 
     def log(self, message):
-        self.log_text.insert(tk.END, f"{message}\n")
+        # 可在后台线程中调用
+        self.runner.log(message)
+
+    def append_log(self, text):
+        self.log_text.insert(tk.END, f"{text}\n")
         self.log_text.see(tk.END)
-        self.root.update()
+
+    def set_output_mode(self, mode):
+        self.selected_output_mode = mode
+
+    def show_error(self, error_msg):
+        self.log(error_msg)
+        self.runner.call_in_ui(messagebox.showerror, "错误", error_msg)
 
     def select_penalty_file(self):
         # 选择奖罚Excel文件
-        self.penalty_file_path = filedialog.askopenfilename(
+        file_path = filedialog.askopenfilename(
             filetypes=[("Excel files", "科室奖罚数据.xlsx")]
         )
-        if not self.penalty_file_path:
+        if not file_path:
             return
+        self.penalty_file_path = file_path
 
         self.log(f"已选择奖罚文件: {self.penalty_file_path}")
+        self.runner.start(self.load_penalty_file)
 
+    def load_penalty_file(self):
+        """后台线程：读取奖罚文件，绩效文件已选择时接着生成文档"""
         try:
-            # 加载奖罚Excel文件（data_only=True 确保读取显示数据而非公式）
-            wb = load_workbook(self.penalty_file_path, data_only=True)
-            sheet = wb.active  # 默认读取第一个工作表
+            started = time.perf_counter()
+            self.penalty_data, row_count = load_penalty_index(self.penalty_file_path)
             self.log("成功加载奖罚数据")
-
-            # 读取奖罚数据
-            for row in range(2, sheet.max_row + 1):  # 从第二行开始读取
-                penalty_type = sheet.cell(row=row, column=1).value
-                department = sheet.cell(row=row, column=2).value
-                amount = sheet.cell(row=row, column=3).value
-                remark = sheet.cell(row=row, column=4).value
-
-                if department not in self.penalty_data:
-                    self.penalty_data[department] = []
-                self.penalty_data[department].append((penalty_type, amount, remark))
-
+            self.log(f"读取奖罚记录 {row_count} 行，涉及 {len(self.penalty_data)} 个科室，"
+                     f"用时 {time.perf_counter() - started:.2f} 秒")
             self.log("奖罚数据已成功加载")
 
-            # 检查是否已选择绩效文件，如果已选择则开始生成文档
+            # 检查是否已选择绩效文件，如果已选择则开始生成文档（绩效数据取自缓存）
             if self.performance_file_path:
-                # 重新加载绩效文件以获取工作表
-                wb_performance = load_workbook(self.performance_file_path)
-                sheet_performance = wb_performance["考核结果"]
-                self.generate_document(sheet_performance)
+                _, rows = load_performance_rows(self.performance_file_path)
+                self.generate_document(rows)
 
+        except TaskCancelled:
+            raise
         except Exception as e:
-            error_msg = f"加载奖罚文件时出现错误: {str(e)}"
-            self.log(error_msg)
-            messagebox.showerror("错误", error_msg)
+            self.show_error(f"加载奖罚文件时出现错误: {str(e)}")
 
     def process_file(self):
         # 选择Excel文件
-        self.performance_file_path = filedialog.askopenfilename(
+        file_path = filedialog.askopenfilename(
             filetypes=[("Excel files", "*绩效文件.xlsx")]
         )
-        if not self.performance_file_path:
+        if not file_path:
             return
+        self.performance_file_path = file_path
 
         self.log(f"已选择文件: {self.performance_file_path}")
+        self.runner.start(self.load_performance_file)
 
+    def load_performance_file(self):
+        """后台线程：读取绩效文件，奖罚文件已选择时接着生成文档"""
         try:
-            # 加载Excel文件（data_only=True 确保读取显示数据而非公式）
-            wb = load_workbook(self.performance_file_path, data_only=True)
-            sheet_names = wb.sheetnames  # 获取所有工作表名称
+            sheet_names, rows = load_performance_rows(self.performance_file_path)
             self.log(f"可用工作表: {sheet_names}")
-
-            # 检查是否存在“考核结果”工作表
-            if "考核结果" not in sheet_names:
-                raise ValueError("工作表 '考核结果' 不存在，请检查文件。")
-
-            sheet = wb["考核结果"]
-            self.log("成功加载工作表'考核结果'")
+            self.log(f"成功加载工作表'考核结果'，共 {len(rows)} 个科室")
 
             # 检查是否已选择奖罚文件，如果已选择则开始生成文档
             if self.penalty_file_path:
-                self.generate_document(sheet)
+                self.generate_document(rows)
 
+        except TaskCancelled:
+            raise
         except Exception as e:
-            error_msg = f"处理过程中出现错误: {str(e)}"
-            self.log(error_msg)
-            messagebox.showerror("错误", error_msg)
-
-    def generate_document(self, sheet):
-        # 创建Word文档
-        doc = Document()
-
-        # 用于存储有奖罚明细的科室名称
-        departments_with_penalties = []
-
-        # 初始化处理计数器
-        processed_count = 0
+            self.show_error(f"处理过程中出现错误: {str(e)}")
 
+    def generate_document(self, rows):
         # 获取上个月的年月
-        current_date = datetime.now()
-        if current_date.month == 1:
-            year = current_date.year - 1
-            month = 12
-        else:
-            year = current_date.year
-            month = current_date.month - 1
+        year, month = previous_month()
+        desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
 
-        # 动态读取行，直到第一列出现“合计”为止
-        for row in range(39, sheet.max_row + 1):  # 从第39行开始
-            if sheet.cell(row=row, column=1).value == "合计":
-                break  # 遇到“合计”停止读取
-            if sheet.cell(row=row, column=1).value:  # 检查序号列
-                department = sheet.cell(row=row, column=2).value
-                if department:  # 如果科室名称不为空
-                    performance_base = format(float(sheet.cell(row=row, column=4).value or 0), '.2f')
-                    assessment_score = format(float(sheet.cell(row=row, column=5).value or 0), '.2f')
-                    actual_performance = format(float(sheet.cell(row=row, column=6).value or 0), '.2f')
-                    rewards_penalties = format(float(sheet.cell(row=row, column=7).value or 0), '.2f')
-                    final_amount = format(float(sheet.cell(row=row, column=8).value or 0), '.2f')
-                    
-                    # 使用计算得到的年月
-                    doc.add_paragraph(f"{department}{year}年{month}月绩效结果")
-                    
-                    # 使用计算得到的年月
-                    if "护理" in department:
-                        doc.add_paragraph(f"护士长您好，{year}年{month}月科室绩效结果如下所示，请查收（考核表和简要数据分析见附件）")
-                    else:
-                        doc.add_paragraph(f"主任您好，{year}年{month}月科室绩效结果如下所示，请查收（考核表和简要数据分析见附件）")
-                    
-                    # 添加科室信息
-                    doc.add_paragraph(f"科室名称：{department}")
-                    doc.add_paragraph(f"应发绩效：{performance_base}")
-                    doc.add_paragraph(f"考核得分：{assessment_score}")
-                    doc.add_paragraph(f"实发绩效：{actual_performance}")
-                    doc.add_paragraph(f"奖惩合计：{rewards_penalties}")
-                    doc.add_paragraph(f"实际发放（二次分配）金额：{final_amount}")
-
-                    # 检查是否有奖罚数据
-                    if department in self.penalty_data:
-                        doc.add_paragraph("单项奖罚明细：")
-                        for penalty_type, amount, remark in self.penalty_data[department]:
-                            doc.add_paragraph(f"金额：{str(amount).replace('=', '')}，备注：{remark.replace('=', '')}")
-                            # 将有奖罚明细的科室名称添加到列表中
-                            departments_with_penalties.append(department)
-
-                    # 添加空行
-                    doc.add_paragraph()
-                    doc.add_paragraph()
-
-                    processed_count += 1
-                    self.log(f"已处理科室: {department}")
-
-        # 生成文件名和路径
-        filename = f"{year}年{month}月 绩效结果.docx"
-        save_path = os.path.join(os.path.expanduser("~"), "Desktop", filename)
-
-        # 保存文件
-        doc.save(save_path)
-        self.log(f"成功处理 {processed_count} 行数据")
-        self.log(f"文件已保存: {save_path}")
-
-        # 打印有奖罚明细的科室名称到控制台
-        if departments_with_penalties:
-            print("有单项奖罚明细的科室名称:")
-            # 去重
-            departments_with_penalties = list(set(departments_with_penalties))
-            for dept in departments_with_penalties:
-                print(dept)
-        else:
-            print("没有科室有单项奖罚明细。")
-
-        messagebox.showinfo("完成", f"文件已保存为: {save_path}")
+        result = generate_letters(
+            rows, self.penalty_data, year, month, desktop_path, self.selected_output_mode,
+            log=self.log, progress=self.runner.set_progress, check_cancelled=self.runner.check_cancelled
+        )
+        print_penalty_departments(result['departments_with_penalties'])
+        self.runner.call_in_ui(messagebox.showinfo, "完成", f"文件已保存为: {result['save_path']}")
 
     def run(self):
         self.root.mainloop()
 
 
+def main(argv=None):
+    """命令行批量模式；不带参数时打开图形界面"""
+    parser = argparse.ArgumentParser(description="生成绩效结果Word文档")
+    parser.add_argument('--batch', metavar='目录', help="在目录（含子目录）中查找各月绩效文件和奖罚文件并批量生成")
+    parser.add_argument('--job', nargs=4, action='append', metavar=('绩效文件', '奖罚文件', '年', '月'),
+                        help="指定一个月份的文件，可重复使用")
+    parser.add_argument('--output', default=os.path.join(os.path.expanduser("~"), "Desktop"),
+                        help="输出目录，默认桌面")
+    parser.add_argument('--mode', choices=sorted(OUTPUT_MODES), default='combined',
+                        help="combined=合并为一个文档，separate=每个科室一个文档，both=两者都生成")
+    parser.add_argument('--workers', type=int, default=None, help="并行处理的月份数，默认CPU核数")
+    args = parser.parse_args(argv)
+
+    if not args.batch and not args.job:
+        app = PerformanceProcessor()
+        app.run()
+        return
+
+    jobs = [MonthJob(perf, penalty, int(year), int(month)) for perf, penalty, year, month in args.job or []]
+    if args.batch:
+        # 同一月份以 --job 指定的文件为准，输出文件按月份命名，不能重复
+        months = {(job.year, job.month) for job in jobs}
+        jobs.extend(job for job in find_month_jobs(args.batch) if (job.year, job.month) not in months)
+    if not jobs:
+        print("没有找到需要处理的月份")
+        return
+    generate_batch(jobs, args.output, OUTPUT_MODES[args.mode], workers=args.workers)
+
+
 if __name__ == "__main__":
-    app = PerformanceProcessor()
-    app.run()
+    # 打包为exe后进程池需要
+    multiprocessing.freeze_support()
+    main()
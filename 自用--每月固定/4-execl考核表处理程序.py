@@ -1,12 +1,71 @@
+import multiprocessing
 import os
+import sys
+import time
 import tkinter as tk
-import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from tkinter import filedialog, scrolledtext
 
 import openpyxl
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Border, Side, Alignment
+
+# 共享模块位于仓库的“工具”目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '工具'))
+from tk_worker import TaskCancelled, TaskRunner
+from xlsx_writer import STYLE_BORDER, STYLE_BORDER_CENTER, XlsxBook
+from zip_packager import STORED, ZipPackager
+
+ASSESSMENT_HEADERS = ["指标名称", "权重", "目标值", "实际值", "实际得分"]
+
+# 少于该数量的考核表不值得启动进程池
+PARALLEL_THRESHOLD = 16
+
+
+def build_assessment_workbook(lines):
+    """
+    生成一个科室的考核表，返回 .xlsx 字节。
+
+    :param lines: [(指标, 权重, 目标值, 实际值, 实际得分), ...]
+    """
+    book = XlsxBook()
+    sheet = book.add_sheet()
+    sheet.set_width(1, 1, 25)
+    for col in range(2, 6):
+        sheet.set_width(col, col, 10)
+
+    # 第一行：B1-E1 合并，显示实际得分合计
+    sheet.append(["总分", '=SUM(E3:E30)', None, None, None],
+                 style=[STYLE_BORDER, STYLE_BORDER_CENTER, STYLE_BORDER, STYLE_BORDER, STYLE_BORDER])
+    sheet.merge('B1:E1')
+    sheet.append(ASSESSMENT_HEADERS, style=STYLE_BORDER)
+    for line in lines:
+        sheet.append(line, style=STYLE_BORDER)
+    return book.to_bytes()
+
+
+def _build_in_worker(record):
+    file_name, lines = record
+    return file_name, build_assessment_workbook(lines)
+
+
+def build_assessment_workbooks(records, workers=None):
+    """
+    为每个科室生成考核表，按 records 的顺序依次产出 (文件名, .xlsx字节)。
+
+    :param records: [(文件名, 行数据), ...]
+    :param workers: 进程数；数量较少或 workers=1 时在当前进程中生成
+    """
+    if workers == 1 or len(records) < PARALLEL_THRESHOLD:
+        yield from map(_build_in_worker, records)
+        return
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(records) // (workers * 4))
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        yield from executor.map(_build_in_worker, records, chunksize=chunksize)
+    finally:
+        # 中途取消时丢弃尚未开始的任务
+        executor.shutdown(cancel_futures=True)
 
 
 class ExcelProcessor:
@@ -21,15 +80,23 @@ class ExcelProcessor:
         self.log_area = scrolledtext.ScrolledText(self.window, width=80, height=30)
         self.log_area.pack(pady=10)
 
+        # 处理在后台线程中执行，日志和进度经队列批量刷新到界面
+        self.runner = TaskRunner(self.window, self.append_log, busy_widgets=[self.select_button])
+        self.runner.frame.pack(fill=tk.X, padx=20)
+
     def log(self, message):
+        # 可在后台线程中调用，时间取记录日志的时刻
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.log_area.insert(tk.END, f"[{current_time}] {message}\n")
+        self.runner.log(f"[{current_time}] {message}")
+
+    def append_log(self, text):
+        self.log_area.insert(tk.END, f"{text}\n")
         self.log_area.see(tk.END)
 
     def select_file(self):
         file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*积分文件.xlsx")])
         if file_path:
-            self.process_excel(file_path)
+            self.runner.start(self.process_excel, file_path)
 
     def get_cell_value(self, cell):
         """获取单元格的值，如果是公式则返回计算结果"""
@@ -63,34 +130,49 @@ class ExcelProcessor:
                     return row_idx
         return None
 
-    def get_fixed_data(self, fixed_sheet, department, indicator):
-        department_row = None
-        for row in fixed_sheet.iter_rows(min_row=1):
-            if row[0].value == department:
-                department_row = row[0].row
-                break
-
-        if not department_row:
-            return None, None
-
-        weight_col = None
-        target_col = None
-        for cell in fixed_sheet[1]:
-            if cell.value == indicator:
-                col_idx = cell.column
-                weight_col = col_idx
-                target_col = col_idx + 1
-                break
+    def compile_fixed_data(self, fixed_sheet):
+        """
+        把“固定数据”表编译为 {(科室, 指标): (权重, 目标值)}。
 
-        if not weight_col or not target_col:
-            return None, None
-
-        weight = self.get_cell_value(fixed_sheet.cell(department_row, weight_col))
-        target = self.get_cell_value(fixed_sheet.cell(department_row, target_col))
-
-        return weight, target
+        科室取第一列中第一次出现的行，指标取第一行中第一次出现的列，
+        权重在指标所在列，目标值在其右侧一列。
+        """
+        rows = list(fixed_sheet.iter_rows(min_row=1, values_only=True))
+        if not rows:
+            return {}
 
-    def get_actual_values(self, file_path, department, header_row):
+        indicator_cols = {}
+        for col_idx, value in enumerate(rows[0]):
+            if value is not None:
+                indicator_cols.setdefault(value, col_idx)
+
+        fixed_data = {}
+        seen_departments = set()
+        for values in rows:
+            department = values[0] if values else None
+            if not department or department in seen_departments:
+                continue
+            seen_departments.add(department)
+            for indicator, col_idx in indicator_cols.items():
+                weight = values[col_idx] if col_idx < len(values) else None
+                target = values[col_idx + 1] if col_idx + 1 < len(values) else None
+                fixed_data[(department, indicator)] = (weight, target)
+        return fixed_data
+
+    def header_columns(self, sheet, row_idx):
+        """表头行中 {表头: 列号}，同名表头取第一次出现的列"""
+        columns = {}
+        for cell in sheet[row_idx]:
+            if cell.value is not None:
+                columns.setdefault(cell.value, cell.column)
+        return columns
+
+    def load_actual_values(self, file_path, header_row):
+        """
+        一次读取实际值文件的“结果”表，返回 {科室: {指标: 实际值}}。
+
+        同一科室取第一次出现的行；"--" 和空值在读取时就去掉。
+        """
         actual_file_path = file_path.replace('积分', '实际值')
 
         if not os.path.exists(actual_file_path):
@@ -98,34 +180,36 @@ class ExcelProcessor:
             return {}
 
         try:
-            actual_wb = openpyxl.load_workbook(actual_file_path, data_only=True)  # 添加data_only=True参数
-            actual_sheet = actual_wb['结果']
-
-            department_row = None
-            for row in actual_sheet.iter_rows(min_row=header_row + 1):
-                if row[0].value == department:
-                    department_row = row
-                    break
-
-            if not department_row:
-                return {}
-
-            actual_values = {}
-            for col in range(1, actual_sheet.max_column + 1):
-                indicator = actual_sheet.cell(header_row, col).value
-                if indicator:
-                    value = self.get_cell_value(department_row[col - 1])
-                    if value != "--" and value is not None:
-                        actual_values[indicator] = value
-
-            return actual_values
+            start_time = time.perf_counter()
+            actual_wb = openpyxl.load_workbook(actual_file_path, read_only=True, data_only=True)
+            try:
+                actual_sheet = actual_wb['结果']
+                indicators = next(actual_sheet.iter_rows(min_row=header_row, max_row=header_row,
+                                                         values_only=True), ())
+
+                actual_index = {}
+                for values in actual_sheet.iter_rows(min_row=header_row + 1, values_only=True):
+                    department = values[0] if values else None
+                    if department is None or department in actual_index:
+                        continue
+                    actual_values = {}
+                    for indicator, value in zip(indicators, values):
+                        if indicator and value != "--" and value is not None:
+                            actual_values[indicator] = value
+                    actual_index[department] = actual_values
+            finally:
+                actual_wb.close()
+
+            self.log(f"已读取实际值文件: {len(actual_index)} 个科室，"
+                     f"用时 {time.perf_counter() - start_time:.2f} 秒")
+            return actual_index
 
         except Exception as e:
             self.log(f"读取实际值文件时发生错误: {str(e)}")
             return {}
 
     def process_excel(self, file_path):
-        saved_files = []
+        saved_files = []  # (文件名, 字节)，直接写入ZIP
         try:
             self.log(f"开始处理文件: {file_path}")
 
@@ -142,100 +226,74 @@ class ExcelProcessor:
                 self.log("未找到合计得分列")
                 return
 
+            # 表结构只解析一次：结果表的表头列、固定数据的 (科室, 指标) -> (权重, 目标值)
+            kpi_col = self.header_columns(result_sheet, header_row).get("KPI")
+            summary_col = self.header_columns(result_sheet, header_summary_row).get("合计得分")
+            indicator_columns = [(cell.column, cell.value) for cell in result_sheet[header_row] if cell.value]
+            fixed_data = self.compile_fixed_data(fixed_sheet)
+
+            # 实际值文件在第一个需要它的科室出现时读取一次，之后各科室共用
+            actual_index = None
+            actual_lookups = actual_misses = 0
+
             desktop_path = os.path.join(os.path.expanduser("~"), "Desktop", "科室积分考核表")
             os.makedirs(desktop_path, exist_ok=True)
 
-            for row in result_sheet.iter_rows(min_row=header_row + 1):
+            records = []  # (文件名, [(指标, 权重, 目标值, 实际值, 实际得分), ...])
+            total_rows = result_sheet.max_row - header_row
+            for row_index, row in enumerate(result_sheet.iter_rows(min_row=header_row + 1), start=1):
+                self.runner.check_cancelled()
+                self.runner.set_progress(row_index, total_rows)
                 department = row[0].value
                 if not department:
                     continue
 
-                kpi_col = None
-                for col in range(1, result_sheet.max_column + 1):
-                    if result_sheet.cell(header_row, col).value == "KPI":
-                        kpi_col = col
-                        break
-                summary_col = None
-                for col in range(1, result_sheet.max_column + 1):
-                    if result_sheet.cell(header_summary_row, col).value == "合计得分":
-                        summary_col = col
-                        break
-
                 if kpi_col and row[kpi_col - 1].value == "--" and row[summary_col - 1].value != 0:
-                    actual_values = self.get_actual_values(file_path, department, header_row)
-
-                    new_wb = openpyxl.Workbook()
-                    new_ws = new_wb.active
-
-                    headers = ["指标名称", "权重", "目标值", "实际值", "实际得分"]
-                    for col, header in enumerate(headers, 1):
-                        new_ws.cell(2, col).value = header
-                        new_ws.cell(1, col).value = "总分"
-
-                    current_row = 3
-                    for col in range(1, result_sheet.max_column + 1):
-                        indicator = result_sheet.cell(header_row, col).value
-                        if indicator:
-                            value = self.get_cell_value(row[col - 1])
-                            if value != "--" and value is not None:
-                                weight, target = self.get_fixed_data(fixed_sheet, department, indicator)
-
-                                if weight is not None and target is not None:
-                                    new_ws.cell(current_row, 1).value = indicator
-                                    new_ws.cell(current_row, 2).value = weight
-                                    new_ws.cell(current_row, 3).value = target
-                                    actual_value = actual_values.get(indicator)
-                                    new_ws.cell(current_row, 4).value = actual_value
-                                    new_ws.cell(current_row, 5).value = value
-                                    current_row += 1
-
-                    for col in range(2, 6):
-                        col_letter = get_column_letter(col)
-                        new_ws[f'{col_letter}1'] = f'=SUM({col_letter}3:{col_letter}30)'
-
-                    # 修改B1单元格的公式并合并B1-E1
-                    new_ws['B1'] = '=SUM(E3:E30)'
-                    new_ws.merge_cells('B1:E1')
-                    merged_cell = new_ws['B1']
-                    merged_cell.alignment = openpyxl.styles.Alignment(horizontal='center', vertical='center')
-
-                    # 在保存文件之前添加样式设置
-                    thin_border = Border(
-                        left=Side(style='thin', color='000000'),
-                        right=Side(style='thin', color='000000'),
-                        top=Side(style='thin', color='000000'),
-                        bottom=Side(style='thin', color='000000')
-                    )
-                    
-                    # 为所有使用过的单元格添加边框
-                    for row in new_ws.iter_rows(min_row=1, max_row=max(current_row-1, 2), min_col=1, max_col=5):
-                        for cell in row:
-                            cell.border = thin_border
-
-                    # 替换原来的自动调整列宽代码
-                    # 设置固定列宽
-                    new_ws.column_dimensions['A'].width = 25  # A列宽度为25
-                    for col in range(2, 6):  # B到E列
-                        col_letter = get_column_letter(col)
-                        new_ws.column_dimensions[col_letter].width = 10
-
-                    file_name = f"{department}考核表.xlsx"
-                    save_path = os.path.join(desktop_path, file_name)
-                    new_wb.save(save_path)
-                    saved_files.append(save_path)
-                    self.log(f"已生成考核表: {file_name}")
-
+                    if actual_index is None:
+                        actual_index = self.load_actual_values(file_path, header_row)
+                    actual_lookups += 1
+                    actual_values = actual_index.get(department)
+                    if actual_values is None:
+                        actual_misses += 1
+                        actual_values = {}
+
+                    lines = []
+                    for col, indicator in indicator_columns:
+                        value = self.get_cell_value(row[col - 1])
+                        if value != "--" and value is not None:
+                            weight, target = fixed_data.get((department, indicator), (None, None))
+
+                            if weight is not None and target is not None:
+                                lines.append((indicator, weight, target, actual_values.get(indicator), value))
+                    records.append((f"{department}考核表.xlsx", lines))
+
+            # 各科室的考核表在进程池中生成，按科室顺序依次写盘
+            self.log(f"开始生成 {len(records)} 个科室的考核表")
+            for done, (file_name, data) in enumerate(build_assessment_workbooks(records), start=1):
+                self.runner.check_cancelled()
+                self.runner.set_progress(done, len(records))
+                save_path = os.path.join(desktop_path, file_name)
+                with open(save_path, 'wb') as f:
+                    f.write(data)
+                saved_files.append((file_name, data))
+                self.log(f"已生成考核表: {file_name}")
+
+            if actual_lookups:
+                self.log(f"实际值查询 {actual_lookups} 次，其中 {actual_misses} 个科室在实际值文件中未找到")
             self.log("处理完成!")
 
+        except TaskCancelled:
+            # 取消时不打包未完成的结果
+            self.log("已取消，未创建ZIP文件")
+            raise
         except Exception as e:
             self.log(f"发生错误: {str(e)}")
 
             # 创建ZIP文件
         zip_path = os.path.join(os.path.join(os.path.expanduser("~"), "Desktop"), f"科室积分考核表.zip")
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file_path in saved_files:
-                arcname = os.path.basename(file_path)
-                zipf.write(file_path, arcname)
+        with ZipPackager(zip_path, level=STORED) as packager:
+            for arcname, data in saved_files:
+                packager.add(arcname, data)
 
         print(f"已创建ZIP文件: {zip_path}")
 
@@ -244,5 +302,7 @@ class ExcelProcessor:
 
 
 if __name__ == "__main__":
+    # 打包为exe后进程池需要
+    multiprocessing.freeze_support()
     app = ExcelProcessor()
     app.run()
\ No newline at end of file